@@ -0,0 +1,22 @@
+// Datatable pages are sent column oriented by the server (see utils.table_pager.to_column_payload),
+// the rows needed by the datatable are rebuilt here
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    vm_props: {
+        records_from_columns: function(page) {
+            if (!page) {
+                return [];
+            }
+            var names = Object.keys(page);
+            var n_rows = names.length ? page[names[0]].length : 0;
+            var records = new Array(n_rows);
+            for (var row = 0; row < n_rows; row++) {
+                var record = {};
+                for (var i = 0; i < names.length; i++) {
+                    record[names[i]] = page[names[i]][row];
+                }
+                records[row] = record;
+            }
+            return records;
+        }
+    }
+});
@@ -0,0 +1,106 @@
+import argparse
+import os
+import sys
+import timeit
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from vm_props_formatter.utils.workbook_reader import expand_merged_cells
+
+
+def generate_wide_sheet(n_countries, stores_per_country, n_props):
+    """
+    Generate the cell values and merged ranges of a synthetic wide order form
+
+    Every country name is merged down its block of store rows and every prop header
+    is merged across two header rows, as in the seasonal forms
+
+    Parameters
+    ----------
+    n_countries : int
+        Number of merged country blocks
+    stores_per_country : int
+        Number of store rows per country
+    n_props : int
+        Number of props columns
+
+    Returns
+    -------
+    values : list of list
+        Cell values by row, empty cells as ''
+    merged_cells : list of tuple
+        Merged ranges as (rlo, rhi, clo, chi), 0-based with rhi and chi excluded
+    """
+    n_cols = 6 + n_props
+    values = [[''] * n_cols, [''] * n_cols]
+    merged_cells = []
+    for col_index in range(6, n_cols):
+        values[0][col_index] = 'PROP %d' % col_index
+        merged_cells.append((0, 2, col_index, col_index + 1))
+    for country in range(n_countries):
+        first_row = len(values)
+        for store in range(stores_per_country):
+            row = [''] * n_cols
+            row[2] = 'Store %d-%d' % (country, store)
+            for col_index in range(6, n_cols):
+                row[col_index] = (country + store + col_index) % 4 or ''
+            values.append(row)
+        values[first_row][1] = 'Country %d' % country
+        merged_cells.append((first_row, len(values), 1, 2))
+    return values, merged_cells
+
+
+def expand_merged_cells_by_scan(values, merged_cells):
+    """
+    Previous implementation, scanning every merged range for every empty cell
+
+    Parameters
+    ----------
+    values : list of list
+        Cell values by row, empty cells as ''
+    merged_cells : list of tuple
+        Merged ranges as (rlo, rhi, clo, chi), 0-based with rhi and chi excluded
+
+    Returns
+    -------
+    data : list of list
+        Cell values by row with merged ranges filled
+    """
+    data = []
+    for row_index in range(len(values)):
+        row = []
+        for col_index in range(len(values[row_index])):
+            valor = values[row_index][col_index]
+            if valor == '':
+                for crange in merged_cells:
+                    rlo, rhi, clo, chi = crange
+                    if rlo <= row_index < rhi and clo <= col_index < chi:
+                        valor = values[rlo][clo]
+                        break
+            row.append(valor)
+        data.append(row)
+    return data
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark merged cell expansion')
+    parser.add_argument('--countries', type=int, default=200, help='Number of merged country blocks')
+    parser.add_argument('--stores', type=int, default=20, help='Number of stores per country')
+    parser.add_argument('--props', type=int, default=150, help='Number of props columns')
+    parser.add_argument('--repeat', type=int, default=3, help='Number of timed runs, best is reported')
+    arguments = parser.parse_args()
+
+    values, merged_cells = generate_wide_sheet(arguments.countries, arguments.stores, arguments.props)
+    print('Sheet: %d rows x %d cols, %d merged ranges' % (len(values), len(values[0]), len(merged_cells)))
+
+    # both implementations must give the same cells
+    expected = np.array(expand_merged_cells_by_scan(values, merged_cells), dtype=object)
+    assert (expected == expand_merged_cells(values, merged_cells)).all()
+
+    scan_time = min(timeit.repeat(lambda: expand_merged_cells_by_scan(values, merged_cells),
+                                  number=1, repeat=arguments.repeat))
+    fill_time = min(timeit.repeat(lambda: expand_merged_cells(values, merged_cells),
+                                  number=1, repeat=arguments.repeat))
+    print('Scan per cell : %.4f s' % scan_time)
+    print('Fill per range: %.4f s' % fill_time)
+    print('Speed-up      : %.1fx' % (scan_time / fill_time))
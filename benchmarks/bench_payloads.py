@@ -0,0 +1,117 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import timeit
+import pandas as pd
+import plotly
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from vm_props_formatter.vm_props_manager import VMPropsManager
+from vm_props_formatter.utils.table_pager import get_table_page, to_column_payload
+from order_form_generator import generate_order_form, get_benchmark_settings
+
+
+def dash_encode(payload):
+    """
+    Encode a callback output as Dash does
+
+    Parameters
+    ----------
+    payload : object
+        Callback output
+
+    Returns
+    -------
+    output : str
+        JSON text
+    """
+    return json.dumps(payload, cls=plotly.utils.PlotlyJSONEncoder)
+
+
+def get_encoders():
+    """
+    Get the encoders to compare, orjson being added if it is installed
+
+    Parameters
+    ----------
+    None
+
+    Returns
+    -------
+    encoders : list of tuple
+        Encoder name and function of a table, returning JSON text
+    """
+    encoders = [
+        ('rows, Dash encoder', lambda df: dash_encode(df.to_dict('records'))),
+        ('columns, Dash encoder', lambda df: dash_encode(to_column_payload(df)))
+    ]
+    try:
+        import orjson
+    except ImportError:
+        return encoders
+    encoders.append(('columns, orjson', lambda df: orjson.dumps(to_column_payload(df))))
+    return encoders
+
+
+def bench_payloads(tables, repeat=5):
+    """
+    Measure the payload size and encode time of tables, from the dataframe to the JSON text
+
+    Parameters
+    ----------
+    tables : list of tuple
+        Table name and dataframe
+    repeat : int
+        Number of timed runs, best is reported
+
+    Returns
+    -------
+    results : list of tuple
+        Table, encoder, payload size in KB and encode time in ms
+    """
+    results = []
+    for name, df in tables:
+        for encoder, function in get_encoders():
+            size_kb = len(function(df)) / 1e3
+            seconds = min(timeit.repeat(lambda: function(df), number=1, repeat=repeat))
+            results.append((name, encoder, size_kb, seconds * 1e3))
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the datatable payloads on a large synthetic SO table')
+    parser.add_argument('--analysis-type', choices=['Regular', 'Seasonal'], default='Regular',
+                        help='Settings giving the shape of the form')
+    parser.add_argument('--size', default='2000x100', help='Size as total stores x props, e.g. 2000x100')
+    parser.add_argument('--stores-per-country', type=int, default=25, help='Number of stores per country block')
+    parser.add_argument('--page-size', type=int, default=50, help='Number of rows per datatable page')
+    parser.add_argument('--repeat', type=int, default=5, help='Number of timed runs, best is reported')
+    parser.add_argument('--csv', default=None, help='Filename to write the results into')
+    arguments = parser.parse_args()
+    pd.options.mode.chained_assignment = None
+
+    settings = get_benchmark_settings(arguments.analysis_type)
+    n_stores, n_props = [int(i) for i in arguments.size.split('x')]
+    n_countries = max(n_stores // arguments.stores_per_country, 1)
+    file_path = generate_order_form(os.path.join(tempfile.mkdtemp(), 'payloads.xlsx'), settings, n_countries,
+                                    min(n_stores, arguments.stores_per_country), n_props)
+    with contextlib.redirect_stdout(io.StringIO()):
+        so_table, checked_data, _ = VMPropsManager(settings).run_pipeline(file_path, os.path.basename(file_path))
+    os.remove(file_path)
+    print('SO table: %d rows x %d cols, checked table: %d rows x %d cols' % (so_table.shape + checked_data.shape))
+
+    tables = [
+        ('SO table', so_table),
+        ('SO table page', get_table_page(so_table, 0, arguments.page_size)[0]),
+        ('checked table', checked_data)
+    ]
+    rows = []
+    for name, encoder, size_kb, milliseconds in bench_payloads(tables, arguments.repeat):
+        print('  %-14s %-22s %11.1f KB %10.2f ms' % (name, encoder, size_kb, milliseconds))
+        rows.append({'table': name, 'encoder': encoder, 'size_kb': size_kb, 'milliseconds': milliseconds})
+    if arguments.csv is not None:
+        pd.DataFrame(rows).to_csv(arguments.csv, index=False)
@@ -0,0 +1,133 @@
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import timeit
+import tracemalloc
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from vm_props_formatter.vm_props_manager import VMPropsManager
+from vm_props_formatter.utils.report_writer import format_and_save_excel
+from order_form_generator import generate_order_form, get_benchmark_settings
+
+
+def measure(function, repeat=3):
+    """
+    Measure the wall time and peak memory of a function
+
+    The time is the best of repeated runs, the peak memory is traced on one more run, as
+    tracing slows the run down. Status lines printed by the function are left out
+
+    Parameters
+    ----------
+    function : callable
+        Function to measure, called with no argument
+    repeat : int
+        Number of timed runs
+
+    Returns
+    -------
+    seconds : float
+        Best wall time
+    peak_mb : float
+        Peak memory allocated during the run, in MB
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        seconds = min(timeit.repeat(function, number=1, repeat=repeat))
+        tracemalloc.start()
+        function()
+        peak_mb = tracemalloc.get_traced_memory()[1] / 1e6
+        tracemalloc.stop()
+    return seconds, peak_mb
+
+
+def bench_order_form(file_path, settings, repeat=3):
+    """
+    Measure each method of the pipeline and the report writer on an order form
+
+    Methods modifying their input are given a copy, which is then part of the measure
+
+    Parameters
+    ----------
+    file_path : str
+        Order form filename
+    settings : dict
+        Settings of the order form
+    repeat : int
+        Number of timed runs
+
+    Returns
+    -------
+    results : list of tuple
+        Method, wall time in seconds and peak memory in MB
+    """
+    vm = VMPropsManager(settings)
+    file_name = os.path.basename(file_path)
+    # run the pipeline once to get the input of each method
+    with contextlib.redirect_stdout(io.StringIO()):
+        data, colours, sheet_name = vm.load_dataset(file_path, file_name, import_merged=True)
+    main_data = vm.get_main_data(data)
+    col_name_list = vm.get_index_to_split_tables(main_data)
+    data_1, data_2 = vm.get_split_data(main_data, col_name_list)[:2]
+    data_1_body = vm.get_split_data(data_1, vm.get_index_to_split_tables2(data_1))[1]
+    main_data_clean = vm.clean_main_data(vm.dropna_rows_cols(data_1_body).copy())
+    df = vm.format_main_data(main_data_clean.copy())
+    checked_data = vm.main_and_summary_checker(df, vm.shorten_table_w_max_rows(data_2))
+    converted_table = vm.main_table_to_so_converter(df)
+    so_table = vm.get_cell_colour_col(converted_table.copy(), colours)
+    report_path = os.path.join(tempfile.mkdtemp(), 'report.xlsx')
+
+    methods = [
+        ('load_dataset', lambda: vm.load_dataset(file_path, file_name, import_merged=True)),
+        ('get_main_data', lambda: vm.get_main_data(data)),
+        ('get_index_to_split_tables', lambda: vm.get_index_to_split_tables(main_data)),
+        ('format_main_data', lambda: vm.format_main_data(main_data_clean.copy())),
+        ('main_table_to_so_converter', lambda: vm.main_table_to_so_converter(df)),
+        ('get_cell_colour_col', lambda: vm.get_cell_colour_col(converted_table.copy(), colours)),
+        ('format_and_save_excel', lambda: format_and_save_excel(checked_data, so_table, io.BytesIO())),
+        ('format_and_save_excel (constant memory)',
+         lambda: format_and_save_excel(checked_data, so_table, report_path, constant_memory=True)),
+        ('run_pipeline', lambda: vm.run_pipeline(file_path, file_name))
+    ]
+    results = []
+    for method, function in methods:
+        seconds, peak_mb = measure(function, repeat)
+        results.append((method, seconds, peak_mb))
+    os.remove(report_path)
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the VM Props pipeline on synthetic order forms')
+    parser.add_argument('--analysis-type', choices=['Regular', 'Seasonal'], nargs='+',
+                        default=['Regular', 'Seasonal'], help='Settings giving the shape of the forms')
+    parser.add_argument('--sizes', nargs='+', default=['100x20', '500x50', '2000x100'],
+                        help='Sizes as total stores x props, e.g. 2000x100')
+    parser.add_argument('--stores-per-country', type=int, default=25, help='Number of stores per country block')
+    parser.add_argument('--repeat', type=int, default=3, help='Number of timed runs, best is reported')
+    parser.add_argument('--csv', default=None, help='Filename to write the results into')
+    arguments = parser.parse_args()
+    pd.options.mode.chained_assignment = None
+
+    forms_path = tempfile.mkdtemp()
+    rows = []
+    for analysis_type in arguments.analysis_type:
+        settings = get_benchmark_settings(analysis_type)
+        for size in arguments.sizes:
+            n_stores, n_props = [int(i) for i in size.split('x')]
+            n_countries = max(n_stores // arguments.stores_per_country, 1)
+            file_path = generate_order_form(os.path.join(forms_path, '%s %s.xlsx' % (analysis_type, size)), settings,
+                                            n_countries, min(n_stores, arguments.stores_per_country), n_props)
+            print('%s %s: %d countries x %d stores x %d props, %.2f MB' % (
+                analysis_type, size, n_countries, min(n_stores, arguments.stores_per_country), n_props,
+                os.path.getsize(file_path) / 1e6))
+            for method, seconds, peak_mb in bench_order_form(file_path, settings, arguments.repeat):
+                print('  %-42s %9.4f s %9.1f MB' % (method, seconds, peak_mb))
+                rows.append({'analysis_type': analysis_type, 'stores': n_stores, 'props': n_props, 'method': method,
+                             'seconds': seconds, 'peak_mb': peak_mb})
+            os.remove(file_path)
+    if arguments.csv is not None:
+        pd.DataFrame(rows).to_csv(arguments.csv, index=False)
@@ -0,0 +1,151 @@
+import argparse
+import os
+import random
+import sys
+import openpyxl
+from openpyxl.styles import PatternFill
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from vm_props_formatter.utils.json_parser import read_json
+
+SETTINGS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'settings')
+FILL_COLOURS = ['FFFFFF00', 'FF00B0F0', 'FF92D050', 'FFFFC000', 'FFFF0000']
+
+
+def get_benchmark_settings(analysis_type):
+    """
+    Get the settings of an analysis type, as used on the synthetic order forms
+
+    Column names compared with the cleaned headers are upper-cased, as clean_main_data
+    upper-cases the headers
+
+    Parameters
+    ----------
+    analysis_type : str
+        'Regular' or 'Seasonal'
+
+    Returns
+    -------
+    settings : dict
+        Settings
+    """
+    settings = read_json(os.path.join(SETTINGS_PATH, analysis_type.lower() + '_settings.json'))
+    names = settings['names']
+    names['country_col'] = names['country_col'].upper()
+    names['main_cols'] = [i.upper() for i in names['main_cols']]
+    return settings
+
+
+def generate_order_form(file_path, settings, n_countries=10, stores_per_country=20, n_props=30,
+                        colour_share=0.2, seed=0):
+    """
+    Write a synthetic order form with the shape given by the settings
+
+    The form has a hidden first sheet, a title, main_header_row header rows (props titles merged
+    across in the first ones), a row of prop codes, blocks of store rows with the country merged
+    down and across two columns and a 'Total:' row each, coloured props cells, then the summary
+    table repeating the props headers with the props totals on its summary_table_sum_row row
+
+    Parameters
+    ----------
+    file_path : str
+        Filename to write
+    settings : dict
+        Settings giving the shape of the form, see get_benchmark_settings
+    n_countries : int
+        Number of country blocks
+    stores_per_country : int
+        Number of store rows per country
+    n_props : int
+        Number of props columns
+    colour_share : float
+        Share of props cells filled with a colour
+    seed : int
+        Random seed
+
+    Returns
+    -------
+    file_path : str
+        Filename
+    """
+    random.seed(seed)
+    shape = settings['shape']
+    names = settings['names']
+    first_prop_col = shape['props_header_start_col'] + 1  # 1-based
+    header_row = shape['main_header_row'] + shape['number_of_header_rows']  # 1-based, last header row
+    main_cols = [i for i in names['main_cols'] if i != names['country_col']]
+    end_cols = ['TOTAL', 'REMARKS'][:max(-shape['props_header_end_col'], 0)]
+
+    workbook = openpyxl.Workbook()
+    hidden_sheet = workbook.active
+    hidden_sheet.title = 'Lists'
+    hidden_sheet.sheet_state = 'hidden'
+    sheet = workbook.create_sheet('Order Form')
+    sheet.cell(shape['title_row'], shape['title_col'] + 1, 'VM PROPS ORDER FORM')
+
+    # headers, the country taking two columns and main columns filling up to the first prop
+    front_cols = ['NO', names['country_col'], ''] + main_cols
+    front_cols += ['INFO %d' % i for i in range(first_prop_col - 1 - len(front_cols))]
+    front_cols = front_cols[:first_prop_col - 1]
+    props = ['PROP %d' % i for i in range(n_props)]
+    for col_index, name in enumerate(front_cols + props + end_cols, 1):
+        sheet.cell(header_row, col_index, name or None)
+    sheet.merge_cells(start_row=header_row, end_row=header_row, start_column=2, end_column=3)
+    for row_index in range(shape['main_header_row'] + 1, header_row):
+        for group_start in range(0, n_props, 5):
+            sheet.cell(row_index, first_prop_col + group_start, 'PROPS GROUP %d' % (group_start // 5))
+            sheet.merge_cells(start_row=row_index, end_row=row_index, start_column=first_prop_col + group_start,
+                              end_column=first_prop_col + min(group_start + 5, n_props) - 1)
+    # prop codes, with no main columns
+    row_index = header_row + 1
+    for prop_index in range(n_props):
+        sheet.cell(row_index, first_prop_col + prop_index, 'PC%04d' % prop_index)
+
+    # store blocks
+    fills = [PatternFill('solid', start_color=i) for i in FILL_COLOURS]
+    totals = [0] * n_props
+    row_index += 1
+    for country_index in range(n_countries):
+        first_row = row_index
+        for store_index in range(stores_per_country):
+            sheet.cell(row_index, 1, row_index)
+            for col_index, name in enumerate(front_cols[3:], 4):
+                sheet.cell(row_index, col_index, ' %s %d-%d ' % (name.title(), country_index, store_index))
+            for prop_index in range(n_props):
+                qty = random.choice([0, 0, 0, 1, 2, 3, None, '  '])
+                cell = sheet.cell(row_index, first_prop_col + prop_index, qty)
+                if isinstance(qty, int):
+                    totals[prop_index] += qty
+                if random.random() < colour_share:
+                    cell.fill = random.choice(fills)
+            row_index += 1
+        sheet.cell(first_row, 2, 'Country %d' % country_index)
+        sheet.merge_cells(start_row=first_row, end_row=row_index - 1, start_column=2, end_column=3)
+        sheet.cell(row_index, 1, 'Total:')
+        row_index += 1
+
+    # summary table
+    row_index += 1
+    for prop_index, name in enumerate(props):
+        sheet.cell(row_index, first_prop_col + prop_index, name)
+    for summary_row in range(1, shape['no_summary_table_rows']):
+        is_sum_row = summary_row == shape['summary_table_sum_row']
+        sheet.cell(row_index + summary_row, first_prop_col - 1, 'TOTAL QTY' if is_sum_row else 'OTHER')
+        for prop_index in range(n_props):
+            sheet.cell(row_index + summary_row, first_prop_col + prop_index, totals[prop_index] if is_sum_row else 0)
+    workbook.save(file_path)
+    return file_path
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Write a synthetic VM Props order form')
+    parser.add_argument('file_path', help='Filename to write')
+    parser.add_argument('--analysis-type', choices=['Regular', 'Seasonal'], default='Regular',
+                        help='Settings giving the shape of the form')
+    parser.add_argument('--countries', type=int, default=10, help='Number of country blocks')
+    parser.add_argument('--stores', type=int, default=20, help='Number of stores per country')
+    parser.add_argument('--props', type=int, default=30, help='Number of props columns')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed')
+    arguments = parser.parse_args()
+    generate_order_form(arguments.file_path, get_benchmark_settings(arguments.analysis_type), arguments.countries,
+                        arguments.stores, arguments.props, seed=arguments.seed)
@@ -0,0 +1,35 @@
+import openpyxl
+import pandas as pd
+from openpyxl.styles import PatternFill
+from vm_props_formatter.utils.name_lookup import NameLookup
+from vm_props_formatter.vm_props_manager import VMPropsManager
+
+
+def make_naming_file(file_path):
+    """
+    Make a props batch naming file with a blank header, a repeated header and formatted empty
+    columns past the table
+    """
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    rows = [['Product Name', 'Batch', None, 'Batch'], ['prop 1', 'b1', 'x', 'b1b'], ['prop 2', 'b2', None, 'b2b']]
+    for row_index, row in enumerate(rows, 1):
+        for col_index, value in enumerate(row, 1):
+            sheet.cell(row_index, col_index, value)
+    for row_index in range(1, len(rows) + 1):
+        for col_index in range(5, 8):
+            sheet.cell(row_index, col_index).fill = PatternFill('solid', start_color='FFFFFF00')
+    workbook.save(file_path)
+    return file_path
+
+
+def test_naming_file_columns_are_unique(tmp_path):
+    file_path = make_naming_file(str(tmp_path / 'batch.xlsx'))
+    data = VMPropsManager().load_dataset(file_path, 'batch.xlsx', file_only=True, sheet_name='', header=0)
+    assert list(data.columns) == ['Product Name', 'Batch', 'Unnamed: 2', 'Batch_1']
+
+    so_format_data = pd.DataFrame({'VM PROPS': ['PROP 1', 'PROP 2', 'PROP 3'], 'Qty': [1, 2, 3]})
+    so_format_data, unmatched_names = NameLookup(data, 'Product Name').apply(so_format_data, 'VM PROPS')
+    assert so_format_data['Batch'].tolist()[:2] == ['B1', 'B2']
+    assert so_format_data['Batch_1'].tolist()[:2] == ['B1B', 'B2B']
+    assert unmatched_names == ['PROP 3']
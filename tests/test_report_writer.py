@@ -0,0 +1,77 @@
+import io
+import re
+import sys
+import zipfile
+import pandas as pd
+import pytest
+import xlsxwriter.workbook
+from vm_props_formatter.utils import report_writer
+from vm_props_formatter.utils.report_writer import format_and_save_excel
+
+COLOURS = ['FFFFFF00', 'FF00B0F0', 'FF92D050']
+
+
+def make_so_table(n_props=4, n_stores=6):
+    """
+    Make a synthetic SO table, each prop block ending with a TOTAL row, store cells coloured in turn
+    """
+    rows = []
+    for prop in range(n_props):
+        for store in range(n_stores):
+            colour = COLOURS[(prop + store) % len(COLOURS)] if store % 2 == 0 else '00000000'
+            rows.append(['Country %d' % store, 'PROP %d' % prop, store + 1, store + 10, 'F', 'F%d' % (store + 10),
+                         colour])
+        rows.append(['TOTAL', 'PROP %d' % prop, n_stores, '', '', '', ''])
+    return pd.DataFrame(rows, columns=['COUNTRY NAME', 'VM PROPS', 'Qty', 'XRow', 'XCol', 'XCell', 'Cell_Colour'])
+
+
+def count_cell_formats(output):
+    """
+    Count the cell formats (cellXfs) of a written workbook
+    """
+    with zipfile.ZipFile(output) as workbook:
+        styles = workbook.read('xl/styles.xml').decode('utf8')
+    return int(re.search(r'<cellXfs count="(\d+)"', styles).group(1))
+
+
+def spy_on_add_format(monkeypatch):
+    """
+    Record the formats added by the report writer itself, leaving out those added by XlsxWriter and pandas
+    """
+    add_format = xlsxwriter.workbook.Workbook.add_format
+    added_formats = []
+
+    def spy(workbook, properties=None):
+        cell_format = add_format(workbook, properties)
+        if sys._getframe(1).f_globals['__name__'] == report_writer.__name__:
+            added_formats.append(cell_format)
+        return cell_format
+
+    monkeypatch.setattr(xlsxwriter.workbook.Workbook, 'add_format', spy)
+    return added_formats
+
+
+@pytest.mark.parametrize('constant_memory', [False, True])
+def test_one_cell_format_per_distinct_colour(tmp_path, monkeypatch, constant_memory):
+    so_table = make_so_table()
+    summary_df = pd.DataFrame({'VM PROPS': ['PROP 0'], 'main': [21], 'summary': [21], 'checks': [True]})
+    output = str(tmp_path / 'report.xlsx') if constant_memory else io.BytesIO()
+    added_formats = spy_on_add_format(monkeypatch)
+    format_and_save_excel(summary_df, so_table, output, constant_memory=constant_memory)
+    # XlsxWriter merges identical formats when saving, so the formats added are counted too:
+    # distinct colours + TOTAL rows, + header and index cells unless written by pandas
+    assert len(added_formats) == len(COLOURS) + 1 + (1 if constant_memory else 0)
+    # distinct colours + TOTAL rows + header and index cells + default
+    assert count_cell_formats(output) == len(COLOURS) + 1 + 1 + 1
+
+
+def test_same_report_in_both_modes(tmp_path):
+    so_table = make_so_table()
+    summary_df = pd.DataFrame({'VM PROPS': ['PROP 0'], 'main': [21], 'summary': [21], 'checks': [True]})
+    pandas_output = format_and_save_excel(summary_df, so_table, io.BytesIO())
+    constant_memory_output = format_and_save_excel(summary_df, so_table, str(tmp_path / 'report.xlsx'),
+                                                   constant_memory=True)
+    for sheet_name in ['SO_Table', 'Summary']:
+        pandas_sheet = pd.read_excel(pandas_output, sheet_name=sheet_name)
+        constant_memory_sheet = pd.read_excel(constant_memory_output, sheet_name=sheet_name)
+        pd.testing.assert_frame_equal(pandas_sheet, constant_memory_sheet)
@@ -0,0 +1,21 @@
+import pandas as pd
+import pytest
+from vm_props_formatter.utils.table_pager import filter_table
+
+
+@pytest.mark.parametrize('filter_query, n_rows', [
+    ('{XRow} contains 11', 2),
+    ('{VM PROPS} contains 1', 2),
+    ('{Qty} contains 0', 0),
+    ('{Qty} >= 2', 2),
+    ('{XRow} = 11', 1),
+    ('{COUNTRY NAME} icontains "sing" && {Qty} < 2', 1)
+])
+def test_filter_like_the_datatable(filter_query, n_rows):
+    df = pd.DataFrame({
+        'COUNTRY NAME': ['Singapore', 'Singapore', 'Malaysia', 'TOTAL'],
+        'VM PROPS': ['PROP 1', 'PROP 2', 1, 'PROP 3'],
+        'Qty': [1.0, 2.0, 11.0, None],
+        'XRow': [11, 12, 111, '']
+    })
+    assert len(filter_table(df, filter_query)) == n_rows
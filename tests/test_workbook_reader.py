@@ -0,0 +1,40 @@
+import openpyxl
+from vm_props_formatter.utils.workbook_reader import expand_merged_cells, read_workbook, stream_workbook
+
+
+def make_order_form(file_path):
+    """
+    Make a small order form with two header rows, front headers merged down both of them, props
+    titles merged across the first one and a summary table repeating the props headers
+    """
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.cell(1, 1, 'VM PROPS ORDER FORM')
+    for col, name in enumerate(['NO', 'STORE NAME', 'SHOP SAP CODE'], 1):
+        sheet.cell(3, col, name)
+        sheet.merge_cells(start_row=3, end_row=4, start_column=col, end_column=col)
+    sheet.cell(3, 4, 'PROPS GROUP')
+    sheet.merge_cells(start_row=3, end_row=3, start_column=4, end_column=5)
+    sheet.cell(4, 4, 'PROP 0')
+    sheet.cell(4, 5, 'PROP 1')
+    for row in range(5, 7):
+        for col, value in enumerate([row - 4, 'Store %d' % row, 1000 + row, 1, 2], 1):
+            sheet.cell(row, col, value)
+    sheet.cell(8, 4, 'PROP 0')
+    sheet.cell(8, 5, 'PROP 1')
+    sheet.cell(9, 4, 2)
+    sheet.cell(9, 5, 4)
+    sheet.cell(12, 1, 'below the summary table')
+    workbook.save(file_path)
+    return file_path
+
+
+def test_streamed_rows_keep_merged_headers(tmp_path):
+    file_path = make_order_form(str(tmp_path / 'form.xlsx'))
+    values, colours, sheet_name = stream_workbook(file_path, first_row=2, header_row=3, tally_cols=(3, 5),
+                                                  tail_rows=2, colour_start_col=3)
+    assert values[1].tolist() == ['NO', 'STORE NAME', 'SHOP SAP CODE', 'PROP 0', 'PROP 1']
+    assert values[0].tolist()[3:] == ['PROPS GROUP', 'PROPS GROUP']
+    # same cells as the full read, from the first row to the end of the summary table
+    full_values, merged_cells, _, _ = read_workbook(file_path)
+    assert values.tolist() == expand_merged_cells(full_values, merged_cells)[2:9].tolist()
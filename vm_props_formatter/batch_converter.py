@@ -0,0 +1,199 @@
+import concurrent.futures
+import datetime
+import glob
+import os
+import time
+import pandas as pd
+from .vm_props_manager import VMPropsManager
+from .utils.file_organizer import check_create_directory
+from .utils.json_parser import read_json
+from .utils.logger import PipelineProfiler
+from .utils.report_writer import format_and_save_excel
+from .utils.table_exporter import EXPORT_FORMATS, export_table
+
+ORDER_FORM_EXTENSIONS = ('.xlsx', '.xlsm')
+
+
+def find_order_forms(inputs):
+    """
+    Find the order form files from folders, glob patterns or filenames
+
+    Parameters
+    ----------
+    inputs : list of str
+        Folders, glob patterns or filenames
+
+    Returns
+    -------
+    file_paths : list of str
+        Sorted order form filenames, without Excel lock files
+    """
+    file_paths = set()
+    for pattern in inputs:
+        if os.path.isdir(pattern):
+            pattern = os.path.join(pattern, '*')
+        for file_path in glob.glob(pattern):
+            file_name = os.path.basename(file_path)
+            if file_name.lower().endswith(ORDER_FORM_EXTENSIONS) and not file_name.startswith('~$'):
+                file_paths.add(file_path)
+    return sorted(file_paths)
+
+
+def get_analysis_type(file_name, analysis_type='auto'):
+    """
+    Get the analysis type of an order form
+
+    Parameters
+    ----------
+    file_name : str
+        Order form filename
+    analysis_type : str
+        'Regular', 'Seasonal', or 'auto' to take Seasonal if the filename says so
+
+    Returns
+    -------
+    analysis_type : str
+        'Regular' or 'Seasonal'
+    """
+    if analysis_type == 'auto':
+        return 'Seasonal' if 'SEASONAL' in file_name.upper() else 'Regular'
+    return analysis_type
+
+
+def get_settings(file_name, analysis_type, settings_path='settings/'):
+    """
+    Get the settings of an order form
+
+    The settings of the analysis type are taken, e.g. seasonal_settings.json, unless the
+    entity of the file has its own, e.g. cks_seasonal_settings.json
+
+    Parameters
+    ----------
+    file_name : str
+        Order form filename
+    analysis_type : str
+        'Regular' or 'Seasonal'
+    settings_path : str
+        Folder of the settings JSON files
+
+    Returns
+    -------
+    settings : dict
+        Settings of the order form
+    entity : str
+        Entity found in the filename, None if not found
+    """
+    settings = read_json(os.path.join(settings_path, analysis_type.lower() + '_settings.json'))
+    entity = VMPropsManager(settings).get_entity(file_name)
+    if entity is not None:
+        entity_settings = read_json(os.path.join(settings_path, '%s_%s_settings.json' % (
+            entity.lower(), analysis_type.lower())))
+        if entity_settings is not None:
+            settings = entity_settings
+    return settings, entity
+
+
+def convert_order_form(file_path, output_path, analysis_type='auto', settings_path='settings/', streaming=False,
+                       file_format='xlsx'):
+    """
+    Convert one order form and write its report, or its SO and checked tables for other formats
+
+    Errors are caught and returned in the summary, so that one bad file does not stop a batch
+
+    Parameters
+    ----------
+    file_path : str
+        Order form filename
+    output_path : str
+        Folder to write the report into
+    analysis_type : str
+        'Regular', 'Seasonal' or 'auto'
+    settings_path : str
+        Folder of the settings JSON files
+    streaming : bool
+        True to load the file in streaming read-only mode
+    file_format : str
+        'xlsx' for the formatted report, or 'csv', 'parquet' or 'feather' for the tables
+
+    Returns
+    -------
+    summary : dict
+        File, entity, analysis type, status, SO rows, failed checks, report, seconds and error
+    """
+    start_time = time.time()
+    file_name = os.path.basename(file_path)
+    analysis_type = get_analysis_type(file_name, analysis_type)
+    summary = {
+        'file': file_path,
+        'entity': None,
+        'analysis_type': analysis_type,
+        'status': 'OK',
+        'so_rows': None,
+        'failed_checks': None,
+        'report': None,
+        'seconds': None,
+        'error': ''
+    }
+    try:
+        settings, summary['entity'] = get_settings(file_name, analysis_type, settings_path)
+        vm = VMPropsManager(settings)
+        profiler = PipelineProfiler(file_path)
+        so_format_data, checked_data, sheet_name = vm.run_pipeline(file_path, file_name, streaming=streaming,
+                                                                   profiler=profiler)
+        if file_format == 'xlsx':
+            report = os.path.join(output_path, os.path.splitext(file_name)[0] + ' - ' + vm.get_file_name(sheet_name))
+            format_and_save_excel(checked_data, so_format_data, report, constant_memory=True)
+        else:
+            report = os.path.join(output_path, '%s - %s SO Table%s' % (
+                os.path.splitext(file_name)[0], sheet_name, EXPORT_FORMATS[file_format][0]))
+            export_table(so_format_data, report, file_format)
+            export_table(checked_data, report.replace(' SO Table.', ' Checks.'), file_format)
+        profiler.log()
+        summary['so_rows'] = len(so_format_data)
+        summary['failed_checks'] = int((~checked_data['checks']).sum())
+        summary['report'] = report
+    except Exception as error:
+        summary['status'] = 'ERROR'
+        summary['error'] = repr(error)
+    summary['seconds'] = round(time.time() - start_time, 3)
+    return summary
+
+
+def run_batch(file_paths, output_path, analysis_type='auto', settings_path='settings/', streaming=False,
+              workers=None, file_format='xlsx'):
+    """
+    Convert order forms over a process pool, writing one report per file and a run summary
+
+    Parameters
+    ----------
+    file_paths : list of str
+        Order form filenames
+    output_path : str
+        Folder to write the reports and run_summary.csv into
+    analysis_type : str
+        'Regular', 'Seasonal' or 'auto'
+    settings_path : str
+        Folder of the settings JSON files
+    streaming : bool
+        True to load the files in streaming read-only mode
+    workers : int
+        Number of processes, the number of CPUs if None
+    file_format : str
+        'xlsx' for formatted reports, or 'csv', 'parquet' or 'feather' for the tables
+
+    Returns
+    -------
+    run_summary : pandas.DataFrame
+        One summary row per file, in the order of file_paths
+    """
+    check_create_directory(os.path.join(output_path, ''))
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(convert_order_form, file_path, output_path, analysis_type, settings_path,
+                                   streaming, file_format) for file_path in file_paths]
+        for future in concurrent.futures.as_completed(futures):
+            summary = future.result()
+            print('[Status]', datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"), ' %s %s (%.3fs) %s' % (
+                summary['status'], summary['file'], summary['seconds'], summary['error']))
+    run_summary = pd.DataFrame([future.result() for future in futures])
+    run_summary.to_csv(os.path.join(output_path, 'run_summary.csv'), index=False)
+    return run_summary
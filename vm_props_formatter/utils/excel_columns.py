@@ -0,0 +1,83 @@
+import functools
+import numpy as np
+import pandas as pd
+
+EXCEL_MAX_COLUMNS = 16384
+
+
+@functools.lru_cache(maxsize=None)
+def get_column_letters():
+    """
+    Get the table of Excel column letters, computed once
+
+    Parameters
+    ----------
+    None
+
+    Returns
+    -------
+    letters : numpy.ndarray
+        Column letters indexed by column number (1-based), letters[0] being ''
+    """
+    letters = [''] * (EXCEL_MAX_COLUMNS + 1)
+    for n in range(1, EXCEL_MAX_COLUMNS + 1):
+        quotient, remainder = divmod(n - 1, 26)
+        letters[n] = letters[quotient] + chr(65 + remainder)
+    letters = np.array(letters, dtype=object)
+    letters.flags.writeable = False
+    return letters
+
+
+@functools.lru_cache(maxsize=None)
+def get_column_numbers():
+    """
+    Get the mapping of Excel column letters to column numbers, computed once
+
+    Parameters
+    ----------
+    None
+
+    Returns
+    -------
+    numbers : dict
+        Column number (1-based) by column letters
+    """
+    return {letters: n for n, letters in enumerate(get_column_letters()) if n > 0}
+
+
+def column_letters(numbers):
+    """
+    Convert column numbers to Excel column letters
+
+    Parameters
+    ----------
+    numbers : int or array-like of int
+        Column numbers (1-based)
+
+    Returns
+    -------
+    letters : str or numpy.ndarray
+        Column letters, e.g. 'A' for 1 and 'AA' for 27
+    """
+    return get_column_letters()[numbers]
+
+
+def column_numbers(letters):
+    """
+    Convert Excel column letters to column numbers, looking up each distinct letters once
+
+    Parameters
+    ----------
+    letters : str or array-like of str
+        Column letters, e.g. 'A' or 'AA'
+
+    Returns
+    -------
+    numbers : int or numpy.ndarray
+        Column numbers (1-based)
+    """
+    if isinstance(letters, str):
+        return get_column_numbers()[letters]
+    codes, uniques = pd.factorize(np.asarray(letters, dtype=object))
+    numbers = get_column_numbers()
+    return np.array([numbers[x] for x in uniques], dtype=np.int64)[codes]
@@ -1,4 +1,6 @@
+import glob
 import os
+import time
 
 
 def check_create_directory(file_path):
@@ -16,3 +18,27 @@ def check_create_directory(file_path):
     directory = os.path.dirname(file_path)
     if not os.path.exists(directory):
         os.makedirs(directory)
+
+
+def remove_old_files(pattern, max_age_seconds):
+    """
+    Remove the files not modified for some time
+
+    Parameters
+    ----------
+    pattern : str
+        Glob pattern of the files
+    max_age_seconds : int
+        Seconds since the last modification after which a file is removed
+
+    Returns
+    -------
+    None
+    """
+    expiry = time.time() - max_age_seconds
+    for file_path in glob.glob(pattern):
+        try:
+            if os.path.getmtime(file_path) < expiry:
+                os.remove(file_path)
+        except OSError:
+            pass  # removed by another process
@@ -0,0 +1,138 @@
+import concurrent.futures
+import logging
+import threading
+import time
+import uuid
+
+
+class JobQueue(object):
+    """
+    In-process queue running jobs on a thread pool, with the progress of each job by stage
+    """
+
+    def __init__(self, stages, max_workers=4, keep_seconds=3600):
+        """
+        Constructor that starts the thread pool
+
+        Parameters
+        ----------
+        stages : list of str
+            Names of the stages jobs go through, in order
+        max_workers : int
+            Number of jobs run at the same time
+        keep_seconds : int
+            Seconds a finished job is kept if its result is never taken
+
+        Returns
+        -------
+        None
+        """
+        self.stages = list(stages)
+        self.keep_seconds = keep_seconds
+        self.__executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
+        self.__jobs = {}
+        self.__lock = threading.Lock()
+
+    def submit(self, function, *args, **kwargs):
+        """
+        Queue a job and return its ID at once
+
+        The function is called with an extra progress keyword argument, a function to call
+        with the name of each stage as it starts
+
+        Parameters
+        ----------
+        function : callable
+            Job to run
+        args : list
+            Positional arguments of the job
+        kwargs : dict
+            Keyword arguments of the job
+
+        Returns
+        -------
+        job_id : str
+            Job ID
+        """
+        job_id = uuid.uuid4().hex
+        with self.__lock:
+            self.__remove_expired_jobs()
+            self.__jobs[job_id] = {
+                'status': 'queued',
+                'stage': None,
+                'result': None,
+                'error': None,
+                'finished': None
+            }
+        self.__executor.submit(self.__run, job_id, function, args, kwargs)
+        return job_id
+
+    def get_status(self, job_id):
+        """
+        Get the status of a job
+
+        Parameters
+        ----------
+        job_id : str
+            Job ID
+
+        Returns
+        -------
+        status : dict
+            Status ('queued', 'running', 'done' or 'failed'), current stage, stage number (1-based),
+            number of stages and error, None if the job is unknown
+        """
+        with self.__lock:
+            job = self.__jobs.get(job_id)
+            if job is None:
+                return None
+            stage = job['stage']
+            return {
+                'status': job['status'],
+                'stage': stage,
+                'stage_number': self.stages.index(stage) + 1 if stage in self.stages else 0,
+                'stages_count': len(self.stages),
+                'error': job['error']
+            }
+
+    def pop_result(self, job_id):
+        """
+        Take the result of a finished job, removing the job
+
+        Parameters
+        ----------
+        job_id : str
+            Job ID
+
+        Returns
+        -------
+        result : object
+            Value returned by the job, None if it is unknown, unfinished or failed
+        """
+        with self.__lock:
+            job = self.__jobs.get(job_id)
+            if job is None or job['finished'] is None:
+                return None
+            del self.__jobs[job_id]
+            return job['result']
+
+    def __run(self, job_id, function, args, kwargs):
+        job = self.__jobs[job_id]
+
+        def progress(stage):
+            job['stage'] = stage
+
+        job['status'] = 'running'
+        try:
+            job['result'] = function(*args, progress=progress, **kwargs)
+            job['status'] = 'done'
+        except Exception as error:
+            logging.exception('Job %s failed at stage %s', job_id, job['stage'])
+            job['status'] = 'failed'
+            job['error'] = repr(error)
+        job['finished'] = time.time()
+
+    def __remove_expired_jobs(self):
+        expiry = time.time() - self.keep_seconds
+        for job_id in [i for i, job in self.__jobs.items() if job['finished'] is not None and job['finished'] < expiry]:
+            del self.__jobs[job_id]
@@ -1,5 +1,8 @@
+import json
 import logging
 import logging.handlers
+import time
+import tracemalloc
 import pandas as pd
 import getpass
 
@@ -22,4 +25,110 @@ def format_logs(app_name, is_format=True):
         logging.getLogger('werkzeug').setLevel(logging.ERROR)
         pd.options.mode.chained_assignment = None
         # Include Open App Info
-        logging.debug((str(getpass.getuser()) + ' is launching the ' + app_name + ' app ...'))
\ No newline at end of file
+        logging.debug((str(getpass.getuser()) + ' is launching the ' + app_name + ' app ...'))
+
+
+class PipelineProfiler(object):
+    """
+    Per run report of the wall time, output shape and peak memory of each pipeline stage
+    """
+
+    def __init__(self, run_name='', trace_memory=False):
+        """
+        Constructor that starts an empty report
+
+        Parameters
+        ----------
+        run_name : str
+            Name of the run in the logs, e.g. the order form filename
+        trace_memory : bool
+            True to trace the peak memory of each stage with tracemalloc, which slows the
+            stages down about 4 times. Memory is traced for the whole process, so it is
+            approximate when other runs overlap
+
+        Returns
+        -------
+        None
+        """
+        self.run_name = run_name
+        self.trace_memory = trace_memory
+        self.stages = []
+
+    def measure(self, stage, function, *args, **kwargs):
+        """
+        Run a stage and record its wall time, output shape and peak memory
+
+        Parameters
+        ----------
+        stage : str
+            Stage name
+        function : callable
+            Stage function
+        args : list
+            Positional arguments of the function
+        kwargs : dict
+            Keyword arguments of the function
+
+        Returns
+        -------
+        output : object
+            Output of the function
+        """
+        # memory is not traced if tracemalloc is already used, e.g. by an overlapping run
+        trace_memory = self.trace_memory and not tracemalloc.is_tracing()
+        if trace_memory:
+            tracemalloc.start()
+        start_time = time.perf_counter()
+        try:
+            output = function(*args, **kwargs)
+        finally:
+            seconds = time.perf_counter() - start_time
+            peak_mb = None
+            if trace_memory:
+                peak_mb = tracemalloc.get_traced_memory()[1] / 1e6
+                tracemalloc.stop()
+        # shape of the output table, the first one of a tuple
+        table = output[0] if isinstance(output, tuple) else output
+        shape = getattr(table, 'shape', ())
+        rows, cols = shape if len(shape) == 2 else (None, None)
+        self.stages.append({
+            'stage': stage,
+            'seconds': round(seconds, 4),
+            'rows': rows,
+            'cols': cols,
+            'peak_mb': None if peak_mb is None else round(peak_mb, 1),
+            'cached': False
+        })
+        return output
+
+    def record_cached(self, stage):
+        """
+        Record a stage taken from a cache
+
+        Parameters
+        ----------
+        stage : str
+            Stage name
+
+        Returns
+        -------
+        None
+        """
+        self.stages.append({'stage': stage, 'seconds': 0.0, 'rows': None, 'cols': None, 'peak_mb': None,
+                            'cached': True})
+
+    def log(self):
+        """
+        Log the report of the run, one line per stage and one for the total
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+        """
+        for i in self.stages:
+            logging.info('Profile %s : %s : %s', self.run_name, i['stage'], json.dumps(i))
+        logging.info('Profile %s : total : %.4fs', self.run_name, sum(i['seconds'] for i in self.stages))
@@ -0,0 +1,99 @@
+import logging
+import pandas as pd
+
+
+def normalize_names(values):
+    """
+    Normalize names for matching, as text upper-cased and stripped, blanks being kept blank
+
+    Whole numbers read as floats, e.g. codes of a column with blanks, are written without decimals
+
+    Parameters
+    ----------
+    values : pandas.Series
+        Names, e.g. product names
+
+    Returns
+    -------
+    values : pandas.Series
+        Normalized names
+    """
+    is_blank = values.isna()
+    if values.dtype.kind == 'f' and ((values[~is_blank] % 1) == 0).all():
+        values = values.fillna(0).astype('int64')
+    return values.astype(object).astype(str).str.upper().str.strip().where(~is_blank)
+
+
+class NameLookup(object):
+    """
+    Naming list indexed by normalized name, to tag SO rows with the columns of their name, e.g. the
+    batch of their props or the warehouse of their country
+
+    The list is parsed once and can be cached and shared between runs, it is not modified by apply
+    """
+
+    def __init__(self, data, key_col):
+        """
+        Constructor that normalizes the naming list and indexes it by name
+
+        All cells are upper-cased and stripped. Names listed more than once keep their first row and
+        are reported in duplicated_names
+
+        Parameters
+        ----------
+        data : pandas.DataFrame
+            Naming list, with a name column
+        key_col : str
+            Name column, e.g. 'Product Name'
+
+        Returns
+        -------
+        None
+        """
+        if key_col not in data.columns:
+            raise KeyError('Column "%s" not found in the naming file' % key_col)
+        data = data.apply(normalize_names)
+        data = data[data[key_col].notna() & (data[key_col] != '')]
+        is_duplicated = data[key_col].duplicated()
+        self.key_col = key_col
+        self.duplicated_names = sorted(data.loc[is_duplicated, key_col].unique())
+        self.__table = data[~is_duplicated].set_index(key_col)
+
+    def __len__(self):
+        return len(self.__table)
+
+    def apply(self, so_format_data, on):
+        """
+        Add the naming list columns to the SO table, matching one of its columns with the names
+
+        Each distinct value of the column is looked up once and its row is then mapped onto all the
+        SO rows, the SO table keeping its rows and their order. Naming list columns already in the
+        SO table (e.g. Qty) are left out and logged
+
+        Parameters
+        ----------
+        so_format_data : pandas.DataFrame
+            SO table, not modified
+        on : str
+            SO table column matched with the names, e.g. 'VM PROPS'
+
+        Returns
+        -------
+        so_format_data : pandas.DataFrame
+            SO table with the naming list columns, blank for unmatched rows
+        unmatched_names : list of str
+            Values of the column not found in the naming list
+        """
+        codes, names = pd.factorize(so_format_data[on].astype(object).fillna(''))
+        matched = self.__table.reindex(normalize_names(pd.Series(names)).values)
+        unmatched_names = sorted(str(i) for i, is_found in zip(names, matched.index.isin(self.__table.index))
+                                 if not is_found and i != '')
+        skipped_cols = [i for i in matched.columns if i in so_format_data.columns]
+        if skipped_cols:
+            print('[Status] Naming list columns already in the SO table, left out: ', ', '.join(map(str, skipped_cols)))
+            logging.warning('Naming list columns already in the SO table, left out: %s', skipped_cols)
+        so_format_data = so_format_data.copy()
+        for col in matched.columns:
+            if col not in skipped_cols:
+                so_format_data[col] = matched[col].values[codes]
+        return so_format_data, unmatched_names
@@ -0,0 +1,174 @@
+import collections
+import hashlib
+import json
+import sys
+import threading
+import numpy as np
+import pandas as pd
+
+
+def hash_content(file_path):
+    """
+    Hash the bytes of a file
+
+    Parameters
+    ----------
+    file_path : str or file-like object
+        Filename or buffer, a buffer is rewound to where it was
+
+    Returns
+    -------
+    content_hash : str
+        SHA-1 hex digest of the file
+    """
+    content_hash = hashlib.sha1()
+    if hasattr(file_path, 'read'):
+        position = file_path.tell()
+        file_path.seek(0)
+        content_hash.update(file_path.read())
+        file_path.seek(position)
+    else:
+        with open(file_path, 'rb') as file:
+            for chunk in iter(lambda: file.read(1 << 20), b''):
+                content_hash.update(chunk)
+    return content_hash.hexdigest()
+
+
+def make_cache_key(*parts):
+    """
+    Make a cache key from JSON serializable parts, e.g. a content hash and settings
+
+    Parameters
+    ----------
+    parts : list
+        Parts of the key, dicts are taken in key order
+
+    Returns
+    -------
+    key : str
+        SHA-1 hex digest of the parts
+    """
+    return hashlib.sha1(json.dumps(parts, sort_keys=True, default=str).encode('utf8')).hexdigest()
+
+
+def get_size(value):
+    """
+    Estimate the memory held by a cached value, e.g. a stage output
+
+    Dataframes are measured with their text cells, tuples, lists, dicts and objects (e.g. a
+    ColourGrid) by adding up their contents
+
+    Parameters
+    ----------
+    value : object
+        Value to measure
+
+    Returns
+    -------
+    size : int
+        Size in bytes
+    """
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, np.ndarray):
+        if value.dtype == object:
+            return int(pd.Series(value.ravel()).memory_usage(deep=True))
+        return int(value.nbytes)
+    if isinstance(value, (tuple, list)):
+        return sys.getsizeof(value) + sum(get_size(i) for i in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(get_size(i) for i in value.values())
+    if hasattr(value, '__dict__'):
+        return sys.getsizeof(value) + get_size(vars(value))
+    return sys.getsizeof(value)
+
+
+class PipelineCache(object):
+    """
+    In-memory cache of pipeline outputs, bounded by the memory its values hold (least recently
+    used go first)
+
+    Values are shared between hits and must not be modified by the caller
+    """
+
+    def __init__(self, max_mb=256):
+        """
+        Constructor that sets the bound of the cache
+
+        Parameters
+        ----------
+        max_mb : float
+            Maximum memory held by the cached values, in MB, as estimated by get_size. A value
+            larger than this is not cached
+
+        Returns
+        -------
+        None
+        """
+        self.max_bytes = int(max_mb * 1e6)
+        self.size = 0
+        self.__entries = collections.OrderedDict()
+        self.__lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Get a cached value
+
+        Parameters
+        ----------
+        key : str
+            Cache key
+
+        Returns
+        -------
+        value : object
+            Cached value, None if not cached
+        """
+        with self.__lock:
+            if key not in self.__entries:
+                return None
+            self.__entries.move_to_end(key)
+            return self.__entries[key][0]
+
+    def put(self, key, value):
+        """
+        Cache a value, removing the least recently used ones to keep within the memory bound
+
+        Parameters
+        ----------
+        key : str
+            Cache key
+        value : object
+            Value to cache
+
+        Returns
+        -------
+        None
+        """
+        size = get_size(value)
+        with self.__lock:
+            if key in self.__entries:
+                self.size -= self.__entries.pop(key)[1]
+            if size > self.max_bytes:
+                return
+            self.__entries[key] = (value, size)
+            self.size += size
+            while self.size > self.max_bytes:
+                self.size -= self.__entries.popitem(last=False)[1][1]
+
+    def clear(self):
+        """
+        Remove all entries
+
+        Returns
+        -------
+        None
+        """
+        with self.__lock:
+            self.__entries.clear()
+            self.size = 0
+
+    def __len__(self):
+        return len(self.__entries)
@@ -0,0 +1,141 @@
+import math
+import pandas as pd
+import xlsxwriter
+
+# pandas header and index cell style, kept by the constant memory writer
+HEADER_FORMAT = {'bold': True, 'border': 1, 'align': 'center', 'valign': 'top'}
+
+
+def get_row_styles(so_table):
+    """
+    Get the row styles of the SO_Table sheet
+
+    Parameters
+    ----------
+    so_table : pandas.DataFrame
+        SO table with cell colours
+
+    Returns
+    -------
+    row_styles : dict
+        (bg colour, bold, border) by Excel row number (0-based, the header being row 0)
+    """
+    row_styles = {}
+    # TOTAL rows have no cell colour and are formatted below
+    colours = so_table['Cell_Colour'].astype(str)
+    is_coloured = ~colours.isin(['00000000', ''])
+    for i, colour in zip(so_table.index[is_coloured], colours[is_coloured]):
+        row_styles[i + 1] = ('#' + colour[-6:], False, 0)  # +1 due to cells start from 1 but python 0
+    # add bold and grey bg for TOTAL rows
+    for i in so_table.index[(so_table.iloc[:, 0] == 'TOTAL').values]:
+        row_styles[i + 1] = ('#e5e5e5', True, 3)
+    return row_styles
+
+
+def format_and_save_excel(summary_df, so_table, output, keep_cols=None, constant_memory=False):
+    """
+    Write the SO and summary tables into a formatted Excel report
+
+    SO rows are filled with the colour of their original cell and TOTAL rows are
+    made bold with a grey background.
+
+    With constant_memory, the sheets are written row by row in XlsxWriter's constant memory
+    mode, each row going to a temporary file once written instead of all cells being held
+    until the workbook is saved. The report is the same as the one written through pandas
+
+    Parameters
+    ----------
+    summary_df : pandas.DataFrame
+        Cross checked table, written to the Summary sheet
+    so_table : pandas.DataFrame
+        SO table with cell colours, written to the SO_Table sheet
+    output : str or file-like object
+        Report filename or buffer to write into, a filename is best with constant_memory
+    keep_cols : list of str
+        SO table columns to write, all if None
+    constant_memory : bool
+        True to write the sheets row by row in constant memory mode
+
+    Returns
+    -------
+    output : str or file-like object
+        Report filename or buffer, rewound to its start
+    """
+    row_styles = get_row_styles(so_table)
+    if keep_cols is not None:
+        so_table = so_table[keep_cols]
+
+    if constant_memory:
+        workbook = xlsxwriter.Workbook(output, {'constant_memory': True})
+    else:
+        # Create a Pandas Excel writer using XlsxWriter as the engine.
+        writer = pd.ExcelWriter(output, engine='xlsxwriter')
+        workbook = writer.book
+
+    # register each distinct row style once, keyed by (bg colour, bold, border)
+    cell_formats = {}
+
+    def get_cell_format(style):
+        if style not in cell_formats:
+            bg_color, bold, border = style
+            cell_formats[style] = workbook.add_format({'bold': True, 'border': border} if bold else {})
+            cell_formats[style].set_pattern(1)
+            cell_formats[style].set_bg_color(bg_color)
+        return cell_formats[style]
+
+    if constant_memory:
+        header_format = workbook.add_format(HEADER_FORMAT)
+        write_sheet_rows(workbook.add_worksheet('SO_Table'), so_table, header_format,
+                         {row: get_cell_format(style) for row, style in row_styles.items()})
+        write_sheet_rows(workbook.add_worksheet('Summary'), summary_df, header_format)
+        workbook.close()
+    else:
+        # Convert dataframes to an XlsxWriter Excel object.
+        so_table.to_excel(writer, sheet_name='SO_Table', encoding='utf8')
+        summary_df.to_excel(writer, sheet_name='Summary', encoding='utf8')
+        worksheet = writer.sheets['SO_Table']
+        for row, style in row_styles.items():
+            worksheet.set_row(row,
+                              None,  # do not change row height
+                              get_cell_format(style)  # add bg colour, bold and border
+                              )
+        # Close the Pandas Excel writer and output the Excel file.
+        writer.save()
+    if hasattr(output, 'seek'):
+        output.seek(0)
+    return output
+
+
+def write_sheet_rows(worksheet, df, header_format, row_formats=None):
+    """
+    Write a dataframe into a worksheet row by row, laid out as by pandas.DataFrame.to_excel
+
+    Rows are written in order, as needed by XlsxWriter's constant memory mode
+
+    Parameters
+    ----------
+    worksheet : xlsxwriter.worksheet.Worksheet
+        Worksheet to write into
+    df : pandas.DataFrame
+        Dataframe to write, with its index in the first column
+    header_format : xlsxwriter.format.Format
+        Format of the header and index cells
+    row_formats : dict
+        Row formats by Excel row number (0-based, the header being row 0)
+
+    Returns
+    -------
+    None
+    """
+    if row_formats is None:
+        row_formats = {}
+    for col, name in enumerate(df.columns):
+        worksheet.write(0, col + 1, name, header_format)
+    for row, values in enumerate(df.itertuples(name=None), 1):
+        if row in row_formats:
+            worksheet.set_row(row, None, row_formats[row])
+        for col, value in enumerate(values):
+            # blank cells are left out, as by pandas
+            if value is None or value == '' or (isinstance(value, float) and math.isnan(value)):
+                continue
+            worksheet.write(row, col, value, header_format if col == 0 else None)
@@ -0,0 +1,220 @@
+import collections
+import glob
+import os
+import pickle
+import shutil
+import threading
+import time
+from vm_props_formatter.utils.file_organizer import check_create_directory
+
+
+class ResultStore(object):
+    """
+    In-memory store of results by session, bounded by number of sessions (least recently used
+    go first) and by time since last use
+    """
+
+    def __init__(self, max_entries=50, ttl_seconds=3600):
+        """
+        Constructor that sets the bounds of the store
+
+        Parameters
+        ----------
+        max_entries : int
+            Maximum number of sessions kept
+        ttl_seconds : int
+            Seconds a session is kept after its last use
+
+        Returns
+        -------
+        None
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.__entries = collections.OrderedDict()
+        self.__lock = threading.Lock()
+
+    def get(self, key, fields=None):
+        """
+        Get the results of a session
+
+        Parameters
+        ----------
+        key : str
+            Session ID
+        fields : list of str
+            Results to get, all if None
+
+        Returns
+        -------
+        values : dict
+            Results of the session, None if unknown or expired
+        """
+        with self.__lock:
+            self.__remove_expired_entries()
+            if key not in self.__entries:
+                return None
+            self.__entries.move_to_end(key)
+            last_used, values = self.__entries[key]
+            self.__entries[key] = (time.time(), values)
+            if fields is not None:
+                return {i: values[i] for i in fields if i in values}
+            return values
+
+    def update(self, key, values):
+        """
+        Add or replace results of a session
+
+        Parameters
+        ----------
+        key : str
+            Session ID
+        values : dict
+            Results to add or replace
+
+        Returns
+        -------
+        None
+        """
+        with self.__lock:
+            self.__remove_expired_entries()
+            stored_values = self.__entries.pop(key, (None, {}))[1]
+            stored_values.update(values)
+            self.__entries[key] = (time.time(), stored_values)
+            while len(self.__entries) > self.max_entries:
+                self.__entries.popitem(last=False)
+
+    def __remove_expired_entries(self):
+        expiry = time.time() - self.ttl_seconds
+        while len(self.__entries) > 0 and next(iter(self.__entries.values()))[0] < expiry:
+            self.__entries.popitem(last=False)
+
+
+class DiskResultStore(object):
+    """
+    Store of results by session pickled on disk, shared by all the workers of the app server,
+    bounded by number of sessions and by time since last use
+
+    Each session is a folder holding one file per result, so that updates only write the results
+    they change and updates of different results from several threads or workers do not undo
+    each other
+    """
+
+    def __init__(self, path, max_entries=50, ttl_seconds=3600):
+        """
+        Constructor that sets the folder and bounds of the store
+
+        Parameters
+        ----------
+        path : str
+            Folder of the session folders
+        max_entries : int
+            Maximum number of sessions kept
+        ttl_seconds : int
+            Seconds a session is kept after its last use
+
+        Returns
+        -------
+        None
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        check_create_directory(os.path.join(path, ''))
+
+    def get(self, key, fields=None):
+        """
+        Get the results of a session
+
+        Parameters
+        ----------
+        key : str
+            Session ID
+        fields : list of str
+            Results to get, all if None, so that large results (e.g. the SO table) are only read
+            when needed
+
+        Returns
+        -------
+        values : dict
+            Results of the session, None if unknown, expired or not a valid session ID
+        """
+        session_path = self.__get_session_path(key)
+        if session_path is None or not os.path.isdir(session_path):
+            return None
+        try:
+            if os.path.getmtime(session_path) < time.time() - self.ttl_seconds:
+                self.__remove(session_path)
+                return None
+            if fields is None:
+                fields = [i[:-len('.pkl')] for i in os.listdir(session_path) if i.endswith('.pkl')]
+            values = {}
+            for field in fields:
+                filename = self.__get_filename(session_path, field)
+                if filename is None or not os.path.isfile(filename):
+                    continue
+                with open(filename, 'rb') as file:
+                    values[field] = pickle.load(file)
+            os.utime(session_path, None)
+        except (EOFError, OSError, pickle.UnpicklingError):
+            return None  # removed by another worker
+        return values
+
+    def update(self, key, values):
+        """
+        Add or replace results of a session
+
+        Results are written one by one in the given order, e.g. a run ID is best written last so
+        that readers checking it find the results of the run
+
+        Parameters
+        ----------
+        key : str
+            Session ID
+        values : dict
+            Results to add or replace
+
+        Returns
+        -------
+        None
+        """
+        session_path = self.__get_session_path(key)
+        if session_path is None:
+            raise KeyError('Invalid session ID: %s' % key)
+        check_create_directory(os.path.join(session_path, ''))
+        for field, value in values.items():
+            filename = self.__get_filename(session_path, field)
+            if filename is None:
+                raise KeyError('Invalid result name: %s' % field)
+            # write then rename, so other workers never read a partial file
+            temp_filename = '%s.%d.%d.tmp' % (filename, os.getpid(), threading.get_ident())
+            with open(temp_filename, 'wb') as file:
+                pickle.dump(value, file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_filename, filename)
+        os.utime(session_path, None)
+        self.__remove_old_entries()
+
+    def __get_session_path(self, key):
+        if key is None or not str(key).isalnum():
+            return None
+        return os.path.join(self.path, str(key))
+
+    def __get_filename(self, session_path, field):
+        if not str(field).replace('_', '').isalnum():
+            return None
+        return os.path.join(session_path, str(field) + '.pkl')
+
+    def __remove(self, session_path):
+        shutil.rmtree(session_path, ignore_errors=True)
+
+    def __remove_old_entries(self):
+        entries = []
+        for session_path in glob.glob(os.path.join(self.path, '*', '')):
+            try:
+                entries.append((os.path.getmtime(session_path), session_path))
+            except OSError:
+                pass  # removed by another worker
+        expiry = time.time() - self.ttl_seconds
+        for i, (last_used, session_path) in enumerate(sorted(entries, reverse=True)):
+            if i >= self.max_entries or last_used < expiry:
+                self.__remove(session_path)
@@ -0,0 +1,112 @@
+# file extension and MIME type by export format
+EXPORT_FORMATS = {
+    'csv': ('.csv', 'text/csv'),
+    'parquet': ('.parquet', 'application/octet-stream'),
+    'feather': ('.feather', 'application/octet-stream')
+}
+# export formats written through pyarrow, an optional dependency
+PYARROW_FORMATS = ['parquet', 'feather']
+
+
+def is_pyarrow_available():
+    """
+    Check if pyarrow can be imported
+
+    Parameters
+    ----------
+    None
+
+    Returns
+    -------
+    output : bool
+        True if pyarrow can be imported
+    """
+    try:
+        import pyarrow
+    except ImportError:
+        return False
+    return True
+
+
+def get_export_formats():
+    """
+    Get the export formats available, Parquet and Feather needing pyarrow
+
+    Parameters
+    ----------
+    None
+
+    Returns
+    -------
+    export_formats : list of str
+        Export formats
+    """
+    if not is_pyarrow_available():
+        return [i for i in EXPORT_FORMATS if i not in PYARROW_FORMATS]
+    return list(EXPORT_FORMATS)
+
+
+def export_table(df, output, file_format):
+    """
+    Export a table, e.g. the SO table with its cell colour column, without Excel formatting
+
+    Text columns, categoricals included, are kept as text and the index is left out
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        Table to export
+    output : str or file-like object
+        Filename or buffer to write into
+    file_format : str
+        'csv', 'parquet' or 'feather'
+
+    Returns
+    -------
+    output : str or file-like object
+        Filename or buffer, rewound to its start
+    """
+    if file_format not in EXPORT_FORMATS:
+        raise ValueError('Unknown export format: %s' % file_format)
+    if file_format in PYARROW_FORMATS and not is_pyarrow_available():
+        raise ImportError('pyarrow is needed to export to %s, run: pip install pyarrow' % file_format)
+    df = df.reset_index(drop=True)
+    if file_format in PYARROW_FORMATS:
+        # typed columns, text columns mixing text and number cells (e.g. a 0 filled country)
+        # are written as text
+        for col in df.columns:
+            is_category = str(df[col].dtype) == 'category'
+            if is_category or df[col].dtype == object:
+                values = df[col].astype(object)
+                values = values.where(values.isna(), values.astype(str))
+                df[col] = values.astype('category') if is_category else values
+    if file_format == 'csv':
+        df.to_csv(output, index=False)
+    elif file_format == 'parquet':
+        df.to_parquet(output, index=False)
+    else:
+        df.to_feather(output)
+    if hasattr(output, 'seek'):
+        output.seek(0)
+    return output
+
+
+def iter_csv_chunks(df, chunk_rows=10000):
+    """
+    Iterate over a table as CSV text, a chunk of rows at a time, to stream it in a response
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        Table to export
+    chunk_rows : int
+        Number of rows per chunk
+
+    Returns
+    -------
+    chunks : generator of str
+        CSV text, the header being in the first chunk
+    """
+    yield df.iloc[:0].to_csv(index=False)
+    for start in range(0, len(df), chunk_rows):
+        yield df.iloc[start:start + chunk_rows].to_csv(index=False, header=False)
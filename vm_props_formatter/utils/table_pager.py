@@ -0,0 +1,190 @@
+import math
+import operator
+import re
+import pandas as pd
+
+# comparison of the filter query operators of dash_table, by symbol and by name
+COMPARISON_OPERATORS = {
+    '>=': operator.ge, 'ge': operator.ge,
+    '<=': operator.le, 'le': operator.le,
+    '<': operator.lt, 'lt': operator.lt,
+    '>': operator.gt, 'gt': operator.gt,
+    '!=': operator.ne, 'ne': operator.ne,
+    '=': operator.eq, 'eq': operator.eq
+}
+TEXT_OPERATORS = ['contains', 'scontains', 'icontains', 'datestartswith']
+# filter query part, e.g. {COUNTRY} contains "Sing" or {Qty} >= 2
+FILTER_PART_PATTERN = re.compile(r'^\s*\{(.+?)\}\s*(\S+)\s*(.*?)\s*$')
+
+
+def split_filter_part(filter_part):
+    """
+    Split a part of a dash_table filter query into column, operator and value
+
+    Parameters
+    ----------
+    filter_part : str
+        Filter query part, e.g. {Qty} >= 2
+
+    Returns
+    -------
+    col : str
+        Column ID, None if the part cannot be read
+    filter_operator : str
+        Operator, e.g. '>=' or 'contains'
+    value : str or float
+        Value, a float if not quoted and numeric, except for text operators which keep the value
+        as written (e.g. 11 for {XRow} contains 11)
+    """
+    match = FILTER_PART_PATTERN.match(filter_part)
+    if match is None:
+        return None, None, None
+    col, filter_operator, value = match.groups()
+    if filter_operator not in COMPARISON_OPERATORS and filter_operator not in TEXT_OPERATORS:
+        return None, None, None
+    if len(value) > 1 and value[0] == value[-1] and value[0] in ('"', "'", '`'):
+        value = value[1:-1].replace('\\' + value[0], value[0])
+    elif filter_operator not in TEXT_OPERATORS:
+        try:
+            value = float(value)
+        except ValueError:
+            pass
+    return col, filter_operator, value
+
+
+def filter_table(df, filter_query):
+    """
+    Filter a table with a dash_table filter query
+
+    Parts of the query are joined by &&. Numbers are compared with the numeric cells only and
+    text with the cells as text, so columns mixing both (e.g. TOTAL rows) can be filtered. Whole
+    numbers are matched as text as shown in the datatable, e.g. 2 rather than 2.0
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        Table to filter
+    filter_query : str
+        Filter query, e.g. {COUNTRY} contains "Sing" && {Qty} >= 2
+
+    Returns
+    -------
+    df : pandas.DataFrame
+        Filtered table
+    """
+    if not filter_query:
+        return df
+    for filter_part in filter_query.split(' && '):
+        col, filter_operator, value = split_filter_part(filter_part)
+        if col not in df.columns:
+            continue
+        values = df[col].astype(object)
+        if filter_operator in TEXT_OPERATORS:
+            text = values.map(lambda x: str(int(x)) if isinstance(x, float) and x.is_integer() else str(x))
+            if filter_operator == 'datestartswith':
+                mask = text.str.startswith(str(value))
+            else:
+                mask = text.str.contains(str(value), case=filter_operator != 'icontains', regex=False)
+            mask &= values.notna()
+        elif isinstance(value, float):
+            mask = COMPARISON_OPERATORS[filter_operator](pd.to_numeric(values, errors='coerce'), value)
+        else:
+            mask = COMPARISON_OPERATORS[filter_operator](values.astype(str), value) & values.notna()
+        df = df[mask.values]
+    return df
+
+
+def sort_table(df, sort_by):
+    """
+    Sort a table by the dash_table sort_by columns
+
+    Columns are sorted as numbers if all their non blank cells are numeric, as text otherwise,
+    blank cells going last
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        Table to sort
+    sort_by : list of dict
+        Sorted columns, in order, each with 'column_id' and 'direction' ('asc' or 'desc')
+
+    Returns
+    -------
+    df : pandas.DataFrame
+        Sorted table
+    """
+    sort_by = [i for i in (sort_by or []) if i['column_id'] in df.columns]
+    if not sort_by or df.empty:
+        return df
+    keys = pd.DataFrame(index=range(len(df)))
+    for i, col in enumerate(sort_by):
+        values = df[col['column_id']].astype(object).replace('', float('nan'))
+        numbers = pd.to_numeric(values, errors='coerce')
+        keys[i] = (numbers if numbers.notna().sum() == values.notna().sum() else values.where(
+            values.isna(), values.astype(str))).values
+    keys = keys.sort_values(list(range(len(sort_by))), ascending=[i['direction'] == 'asc' for i in sort_by],
+                            kind='mergesort', na_position='last')
+    return df.iloc[keys.index]
+
+
+def get_table_page(df, page_current, page_size, sort_by=None, filter_query=''):
+    """
+    Get a page of a filtered and sorted table, as used by a dash_table in custom paging mode
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        Table
+    page_current : int
+        Page number, 0-based, the last page being taken if past it
+    page_size : int
+        Number of rows per page
+    sort_by : list of dict
+        Sorted columns, see sort_table
+    filter_query : str
+        Filter query, see filter_table
+
+    Returns
+    -------
+    page : pandas.DataFrame
+        Rows of the page
+    page_count : int
+        Number of pages, at least 1
+    """
+    df = sort_table(filter_table(df, filter_query), sort_by)
+    page_count = max(int(math.ceil(len(df) / float(page_size))), 1)
+    page_current = min(page_current or 0, page_count - 1)
+    return df.iloc[page_current * page_size:(page_current + 1) * page_size], page_count
+
+
+def to_column_payload(df):
+    """
+    Convert a table into a compact column oriented payload, to be sent to the browser as JSON
+
+    Column names are given once instead of on every row, quantity columns holding whole numbers
+    are sent as integers (e.g. 2 rather than 2.0) and blank cells as None, so that the payload
+    is valid JSON without being re-encoded to replace NaN
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        Table, e.g. a page of the SO table
+
+    Returns
+    -------
+    payload : dict
+        List of cell values by column name, in column order
+    """
+    payload = {}
+    for col in df.columns:
+        values = df[col]
+        if values.dtype.kind in 'biu':
+            payload[col] = values.tolist()
+            continue
+        is_blank = values.isna()
+        if values.dtype.kind == 'f' and ((values[~is_blank] % 1) == 0).all():
+            values = values.fillna(0).astype('int64')
+        else:
+            values = values.astype(object)
+        payload[col] = [None if blank else value for value, blank in zip(values.tolist(), is_blank.tolist())]
+    return payload
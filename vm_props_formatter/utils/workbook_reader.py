@@ -0,0 +1,365 @@
+from xml.etree import ElementTree
+import numpy as np
+import openpyxl
+import xlrd
+from openpyxl.utils.cell import coordinate_to_tuple, range_boundaries
+from openpyxl.xml.constants import SHEET_MAIN_NS
+
+MERGE_CELL_TAG = '{%s}mergeCell' % SHEET_MAIN_NS
+
+
+class ColourGrid(object):
+    """
+    Fill colours of a block of a worksheet, read once and addressed like the worksheet itself
+    """
+
+    def __init__(self, colours, first_row=1, first_col=1):
+        """
+        Constructor that keeps the colour array
+
+        Parameters
+        ----------
+        colours : numpy.ndarray
+            2-D array of fill colour indexes
+        first_row : int
+            Excel row number (1-based) of the first row of colours
+        first_col : int
+            Excel column number (1-based) of the first column of colours
+
+        Returns
+        -------
+        None
+        """
+        self.colours = colours
+        self.first_row = first_row
+        self.first_col = first_col
+
+    def __getitem__(self, coordinate):
+        """
+        Get the fill colour of a cell
+
+        Parameters
+        ----------
+        coordinate : str
+            Excel cell coordinate, e.g. 'F12'
+
+        Returns
+        -------
+        colour : str
+            Fill colour index, '00000000' if the cell is outside the block
+        """
+        row, col = coordinate_to_tuple(coordinate)
+        row -= self.first_row
+        col -= self.first_col
+        if not (0 <= row < self.colours.shape[0] and 0 <= col < self.colours.shape[1]):
+            return '00000000'
+        return self.colours[row, col]
+
+    def take(self, rows, cols):
+        """
+        Get the fill colours of many cells in one gather
+
+        Parameters
+        ----------
+        rows : array-like of int
+            Excel row numbers (1-based)
+        cols : array-like of int
+            Excel column numbers (1-based)
+
+        Returns
+        -------
+        colours : numpy.ndarray
+            Fill colour indexes, '00000000' for cells outside the block
+        """
+        rows = np.asarray(rows, dtype=np.int64) - self.first_row
+        cols = np.asarray(cols, dtype=np.int64) - self.first_col
+        inside = (rows >= 0) & (rows < self.colours.shape[0]) & (cols >= 0) & (cols < self.colours.shape[1])
+        colours = np.full(len(rows), '00000000', dtype=object)
+        colours[inside] = self.colours[rows[inside], cols[inside]]
+        return colours
+
+
+def build_colour_array(colours, n_cols):
+    """
+    Stack rows of fill colours into a 2-D array, padding short rows
+
+    Parameters
+    ----------
+    colours : list of list
+        Fill colour indexes by row
+    n_cols : int
+        Number of columns of the array
+
+    Returns
+    -------
+    colour_array : numpy.ndarray
+        2-D object array of fill colour indexes, '00000000' where padded
+    """
+    colour_array = np.full((len(colours), max(n_cols, 0)), '00000000', dtype=object)
+    for row_index, row in enumerate(colours):
+        colour_array[row_index, :len(row)] = row
+    return colour_array
+
+
+def get_first_visible_sheet_name(workbook):
+    """
+    Get the name of the first visible sheet of a workbook
+
+    Parameters
+    ----------
+    workbook : openpyxl.Workbook
+        Workbook to search
+
+    Returns
+    -------
+    sheet_name : str
+        Name of the first visible sheet
+    """
+    visible_sheets = [sheet.title for sheet in workbook.worksheets if sheet.sheet_state == 'visible']
+    return str(visible_sheets[0])
+
+
+def expand_merged_cells(values, merged_cells):
+    """
+    Fill the empty cells of each merged range with the value of its top-left cell
+
+    Each range is painted once onto an object array, so the cost is the number of cells
+    plus the merged area rather than cells x merged ranges
+
+    Parameters
+    ----------
+    values : list of list
+        Cell values by row, empty cells as ''
+    merged_cells : list of tuple
+        Merged ranges as (rlo, rhi, clo, chi), 0-based with rhi and chi excluded
+
+    Returns
+    -------
+    cells : numpy.ndarray
+        2-D object array of cell values with merged ranges filled
+    """
+    cells = np.empty((len(values), max([len(row) for row in values] + [0])), dtype=object)
+    cells[:] = ''
+    for row_index, row in enumerate(values):
+        cells[row_index, :len(row)] = row
+    for rlo, rhi, clo, chi in merged_cells:
+        block = cells[rlo:rhi, clo:chi]
+        block[block == ''] = cells[rlo, clo]
+    return cells
+
+
+def read_workbook(file_path, sheet_name='', colour_start_row=0, colour_start_col=0):
+    """
+    Parse a workbook once and return its cell values, merged ranges and fill colours
+
+    Fill colours are only kept from colour_start_row and colour_start_col onwards, i.e. for the
+    props block of an order form
+
+    Parameters
+    ----------
+    file_path : str or file-like object
+        Excel workbook to read
+    sheet_name : str
+        Sheet to read, the first visible sheet is taken if blank
+    colour_start_row : int
+        0-based index of the first row to read fill colours for
+    colour_start_col : int
+        0-based index of the first column to read fill colours for
+
+    Returns
+    -------
+    values : list of list
+        Cell values by row, empty cells as ''
+    merged_cells : list of tuple
+        Merged ranges as (rlo, rhi, clo, chi), 0-based with rhi and chi excluded
+    colours : ColourGrid
+        Fill colours of the block from colour_start_row and colour_start_col
+    sheet_name : str
+        Name of the sheet read
+    """
+    workbook = openpyxl.load_workbook(file_path, data_only=True)
+    if sheet_name == '':
+        sheet_name = get_first_visible_sheet_name(workbook)
+    sheet = workbook[sheet_name]
+    values = []
+    colours = []
+    for row_index, row in enumerate(sheet.iter_rows()):
+        values.append(['' if cell.value is None else cell.value for cell in row])
+        if row_index >= colour_start_row:
+            colours.append([str(cell.fill.start_color.index) for cell in row[colour_start_col:]])
+    merged_cells = [(crange.min_row - 1, crange.max_row, crange.min_col - 1, crange.max_col)
+                    for crange in sheet.merged_cells.ranges]
+    colours = build_colour_array(colours, sheet.max_column - colour_start_col)
+    return values, merged_cells, ColourGrid(colours, colour_start_row + 1, colour_start_col + 1), sheet_name
+
+
+def read_xls_sheet(file_path, sheet_name=''):
+    """
+    Read the cell values of a sheet of a legacy .xls workbook, which openpyxl cannot open
+
+    Fill colours are not read, so this is for files read for their values only, e.g. naming files
+
+    Parameters
+    ----------
+    file_path : str or file-like object
+        Excel 97-2003 workbook to read
+    sheet_name : str
+        Sheet to read, the first visible sheet is taken if blank
+
+    Returns
+    -------
+    values : list of list
+        Cell values by row, empty cells as '', whole numbers as int
+    sheet_name : str
+        Name of the sheet read
+    """
+    if hasattr(file_path, 'read'):
+        position = file_path.tell()
+        file_path.seek(0)
+        book = xlrd.open_workbook(file_contents=file_path.read())
+        file_path.seek(position)
+    else:
+        book = xlrd.open_workbook(file_path)
+    if sheet_name == '':
+        sheet_name = str([sheet.name for sheet in book.sheets() if sheet.visibility == 0][0])
+    sheet = book.sheet_by_name(sheet_name)
+    values = []
+    for row_index in range(sheet.nrows):
+        row = []
+        for cell in sheet.row(row_index):
+            value = cell.value
+            if cell.ctype == xlrd.XL_CELL_NUMBER and float(value).is_integer():
+                value = int(value)
+            elif cell.ctype == xlrd.XL_CELL_DATE:
+                value = xlrd.xldate.xldate_as_datetime(value, book.datemode)
+            row.append(value)
+        values.append(row)
+    return values, sheet_name
+
+
+def read_merged_cells(sheet):
+    """
+    Read the merged ranges of a sheet opened in read-only mode, where openpyxl does not give them
+
+    The sheet XML is parsed once more element by element and each element is cleared once read,
+    so memory stays bounded like the read-only rows
+
+    Parameters
+    ----------
+    sheet : openpyxl.worksheet._read_only.ReadOnlyWorksheet
+        Sheet of a workbook opened in read-only mode
+
+    Returns
+    -------
+    merged_cells : list of tuple
+        Merged ranges as (rlo, rhi, clo, chi), 0-based with rhi and chi excluded
+    """
+    merged_cells = []
+    source = sheet._get_source()
+    try:
+        for _, element in ElementTree.iterparse(source):
+            if element.tag == MERGE_CELL_TAG:
+                min_col, min_row, max_col, max_row = range_boundaries(element.get('ref'))
+                merged_cells.append((min_row - 1, max_row, min_col - 1, max_col))
+            element.clear()
+    finally:
+        source.close()
+    return merged_cells
+
+
+def expand_kept_merged_cells(values, merged_cells):
+    """
+    Fill the merged ranges of the rows read so far, leaving out the ranges whose top-left cell is
+    not among them
+
+    Parameters
+    ----------
+    values : list of list
+        Cell values by row, empty cells as ''
+    merged_cells : list of tuple
+        Merged ranges as (rlo, rhi, clo, chi), 0-based from the first row of values
+
+    Returns
+    -------
+    cells : numpy.ndarray
+        2-D object array of cell values with merged ranges filled, see expand_merged_cells
+    """
+    n_cols = max([len(row) for row in values] + [0])
+    return expand_merged_cells(values, [(rlo, rhi, clo, chi) for rlo, rhi, clo, chi in merged_cells
+                                        if rlo < len(values) and clo < n_cols])
+
+
+def stream_workbook(file_path, sheet_name='', first_row=0, header_row=None, tally_cols=(0, 0), tail_rows=0,
+                    colour_start_col=0):
+    """
+    Read a sheet row by row in read-only mode, keeping only the rows of the order form tables
+
+    Reading starts at first_row and stops tail_rows rows after the first row whose tally_cols
+    repeat the header_row (the summary table header). openpyxl holds a single row at a time,
+    so memory is bounded by the rows kept: (summary end - first_row) x used columns values,
+    plus the same rows x (used columns - colour_start_col) colours. Rows above first_row and
+    below the summary table are never stored, whatever the size of the sheet.
+
+    Merged ranges are read separately (see read_merged_cells) and expanded over the kept rows,
+    as by read_workbook, so that e.g. front headers merged down the header rows are kept. Ranges
+    starting above first_row are left empty, their value not being read.
+
+    Parameters
+    ----------
+    file_path : str or file-like object
+        Excel workbook to read
+    sheet_name : str
+        Sheet to read, the first visible sheet is taken if blank
+    first_row : int
+        0-based index of the first row to keep
+    header_row : int
+        0-based index of the header row repeated by the summary table, None to read to the end
+    tally_cols : tuple of int
+        0-based start and end (excluded) of the columns to tally against the header row
+    tail_rows : int
+        Number of rows to keep from the repeated header row onwards
+    colour_start_col : int
+        0-based index of the first column to read fill colours for
+
+    Returns
+    -------
+    values : numpy.ndarray
+        2-D object array of cell values by row from first_row, empty cells as '' and merged ranges
+        filled
+    colours : ColourGrid
+        Fill colours of the kept rows from colour_start_col
+    sheet_name : str
+        Name of the sheet read
+    """
+    workbook = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+    if sheet_name == '':
+        sheet_name = get_first_visible_sheet_name(workbook)
+    sheet = workbook[sheet_name]
+    # merged ranges shifted to the kept rows
+    merged_cells = [(rlo - first_row, rhi - first_row, clo, chi) for rlo, rhi, clo, chi in read_merged_cells(sheet)
+                    if rlo >= first_row]
+    values = []
+    colours = []
+    header = None
+    stop_row = None
+    for row_index, row in enumerate(sheet.iter_rows(min_row=first_row + 1), first_row):
+        row_values = ['' if cell.value is None else cell.value for cell in row]
+        values.append(row_values)
+        colours.append(['00000000' if cell.fill is None else str(cell.fill.start_color.index)
+                        for cell in row[colour_start_col:]])
+        if row_index == header_row:
+            # header cells merged down or across the header rows
+            row_values = expand_kept_merged_cells(values, merged_cells)[-1].tolist()
+        tally = [str(value).strip() for value in row_values[tally_cols[0]:tally_cols[1]]]
+        if row_index == header_row and '' not in tally:
+            header = tally
+        elif header is not None and stop_row is None and tally == header:
+            stop_row = row_index + tail_rows
+        if stop_row is not None and row_index + 1 >= stop_row:
+            break
+    workbook.close()
+    values = expand_kept_merged_cells(values, merged_cells)
+    n_cols = values.shape[1]
+    colours = build_colour_array(colours, n_cols - colour_start_col)
+    return values, ColourGrid(colours, first_row + 1, colour_start_col + 1), sheet_name
+
@@ -1,8 +1,10 @@
 import copy
-import openpyxl
+import os
 import pandas as pd
 import numpy as np
-import xlrd
+from .utils.excel_columns import column_letters, column_numbers
+from .utils.pipeline_cache import hash_content, make_cache_key
+from .utils.workbook_reader import expand_merged_cells, read_workbook, read_xls_sheet, stream_workbook
 #import glob
 #import os
 #from .utils.file_organizer import check_create_directory
@@ -10,6 +12,42 @@ import xlrd
 
 class VMPropsManager(object):
     """"""
+    PIPELINE_STAGES = ['load', 'header', 'split', 'clean', 'format', 'check', 'convert', 'colour']
+    __stage_inputs = {
+        'load': [],
+        'header': ['load'],
+        'split': ['header'],
+        'clean': ['split'],
+        'format': ['clean'],
+        'check': ['split', 'format'],
+        'convert': ['format'],
+        'colour': ['load', 'convert']
+    }
+    __stage_parameters = {
+        'load': {
+            'names': ['sheet_name'],
+            'shape': ['main_header_row', 'props_header_start_col']
+        },
+        'load_streaming': {
+            'names': ['sheet_name'],
+            'shape': ['main_header_row', 'props_header_start_col', 'number_of_header_rows',
+                      'props_header_tally_first', 'no_summary_table_rows']
+        },
+        'header': {'shape': ['main_header_row', 'number_of_header_rows']},
+        'split': {'shape': ['props_header_start_col', 'props_header_tally_first'], 'names': ['main_cols']},
+        'clean': {},
+        'format': {
+            'shape': ['props_header_start_col', 'props_header_end_col'],
+            'names': ['country_col', 'drop_rows_with']
+        },
+        'check': {'shape': ['props_header_start_col', 'props_header_end_col', 'no_summary_table_rows',
+                            'summary_table_sum_row']},
+        'convert': {
+            'shape': ['props_header_start_col', 'props_header_end_col'],
+            'names': ['main_cols']
+        },
+        'colour': {}
+    }
     __data_parser = None
     __parameters = None
     __defaults = {
@@ -92,79 +130,148 @@ class VMPropsManager(object):
                 entity = i
         return entity
 
-    def load_dataset(self, file_path, file_name, file_only=False, sheet_name=None, header=None, import_merged=False):
+    def load_dataset(self, file_path, file_name, file_only=False, sheet_name=None, header=None, import_merged=False,
+                     streaming=False):
         """
         Loads excel files into data and colour information
+
+        With streaming, the sheet is read in read-only mode and only the rows from main_header_row
+        to the end of the summary table are kept, with colours for the props columns only (see
+        workbook_reader.stream_workbook for the memory bound). The data index then starts at
+        main_header_row, keeping the original row numbers. header and import_merged are not
+        used, merged ranges are expanded except those starting above main_header_row.
+
+        With file_only, .xls files (e.g. naming files) are read through xlrd, with no colours
+        and no merged cells.
         
         Parameters
         ----------
-        file_path : byte
+        file_path : str or file-like object
         file_name : str
         file_only : bool
         sheet_name : str
         header : int
         import_merged : bool
+        streaming : bool
 
         Returns
         -------
         data: pandas DataFrame
-        sh : object
+        sh : ColourGrid
+            Fill colours of the sheet, indexed by cell coordinate
+        sheet_name : str
 
         """
         # load sheet name from parameters
         if sheet_name is None:
             sheet_name = self.__parameters['names']['sheet_name']
-        # open file
-        book = pd.ExcelFile(file_path).book
-        # take first, if sheet_name is blank/ not specified
+        # open file once for values, merged cells and colours of the props block
+        # takes first visible sheet, if sheet_name is blank/ not specified
+        shape = self.__parameters['shape']
+        skiprows = shape['main_header_row']
+        props_start_col = shape['props_header_start_col']
+        if streaming:
+            values, colours, read_sheet_name = stream_workbook(
+                file_path, sheet_name, first_row=skiprows,
+                header_row=skiprows + shape['number_of_header_rows'] - 1,
+                tally_cols=(props_start_col, props_start_col + shape['props_header_tally_first']),
+                tail_rows=shape['no_summary_table_rows'], colour_start_col=props_start_col)
+        elif file_only and os.path.splitext(file_name)[1].lower() == '.xls':
+            # legacy naming files, read for their values only
+            values, read_sheet_name = read_xls_sheet(file_path, sheet_name)
+            merged_cells, colours = [], None
+        else:
+            values, merged_cells, colours, read_sheet_name = read_workbook(
+                file_path, sheet_name, colour_start_row=skiprows, colour_start_col=props_start_col)
         if sheet_name == '':
-            # check all sheet names in book
-            sheets = book.sheets()
-            visible_sheets = []
-            for sheet in sheets:
-                if sheet.visibility == 0:  # sheet is visible
-                    visible_sheets.append(sheet.name)
-            # take first visible sheet
-            sheet_name = str(visible_sheets[0])
-            print('[Status] Sheet name not specified. Took sheet by loc: ', sheet_name)
+            print('[Status] Sheet name not specified. Took sheet by loc: ', read_sheet_name)
+        sheet_name = read_sheet_name
         print('[Status] Loading File: "%s";' % file_name, '"Loading Sheet: "%s"' % sheet_name)
-        if not import_merged:
-            data = pd.read_excel(file_path, sheet_name, index_col=None, header=header)
+        if streaming:
+            data = pd.DataFrame(values, index=range(skiprows, skiprows + len(values)))
+        elif not import_merged:
+            data = pd.DataFrame(values)
+            if header is not None:
+                data.columns = data.iloc[header]
+                data = data.iloc[header + 1:].reset_index(drop=True)
         else:
-            # read file data by sheet_name
-            sheet = book.sheet_by_name(sheet_name)
             # get and overwrite merged cells
-            data = []
-            for row_index in range(sheet.nrows):
-                row = []
-                for col_index in range(sheet.ncols):
-                    valor = sheet.cell(row_index, col_index).value
-                    if valor == '':
-                        for crange in sheet.merged_cells:
-                            rlo, rhi, clo, chi = crange
-                            if rlo <= row_index < rhi and clo <= col_index < chi:
-                                valor = sheet.cell(rlo, clo).value
-                                break
-                    row.append(valor)
-                data.append(row)
-            data = pd.DataFrame(data)
-        # remove leading and trailing whitespaces in cells
-        data = data.applymap(lambda x: str(x).strip())
-        # remove None types in different formats
-        data = data.replace(["NA", "NONE", "NAN", "NULL", ""], np.nan)
-        # read colours info
+            data = pd.DataFrame(expand_merged_cells(values, merged_cells))
+        # remove leading and trailing whitespaces and None types in cells
+        data = self.normalize_cells(data)
+        if header is not None and not streaming and not import_merged:
+            data = self.name_header_columns(data)
+        # return colours info
         if not file_only:
-            wb = openpyxl.load_workbook(file_path, data_only=True)
-            sh = wb[sheet_name]
-            return data, sh, sheet_name
+            return data, colours, sheet_name
         else:
             return data
 
+    def normalize_cells(self, data, null_values=None):
+        """
+        Strip text cells and replace blank or None-like text with NaN
+
+        Runs as a single pass over the object columns as one NumPy array, numeric cells and
+        columns are left as they are
+
+        Parameters
+        ----------
+        data : pandas.DataFrame
+            Dataframe to run the operation on
+        null_values : list of str
+            Texts to read as NaN once stripped
+
+        Returns
+        -------
+        data : pandas.DataFrame
+            Normalized dataframe
+        """
+        if null_values is None:
+            null_values = ["NA", "NONE", "NAN", "NULL", ""]
+        data = data.copy()
+        object_cols = np.flatnonzero((data.dtypes == object).values)
+        if len(object_cols) == 0:
+            return data
+        # strip text cells only
+        block = data.iloc[:, object_cols].values
+        cells = np.empty(block.size, dtype=object)
+        cells[:] = [x.strip() if isinstance(x, str) else x for x in block.ravel()]
+        # replace None types in different formats
+        cells = pd.Series(cells)
+        cells[cells.isna() | cells.isin(null_values)] = np.nan
+        data.iloc[:, object_cols] = cells.values.reshape(block.shape)
+        return data
+
+    def name_header_columns(self, data):
+        """
+        Drop the empty columns read under a blank header and give unique names to the others
+
+        Sheets often count formatted empty columns past the table as used, these are dropped. Other
+        blank headers are named 'Unnamed: <column position>' as by pandas.read_excel, and repeated
+        headers are numbered (see rename_duplicate_column_names)
+
+        Parameters
+        ----------
+        data : pandas.DataFrame
+            Normalized dataframe, with the header row as columns
+
+        Returns
+        -------
+        data : pandas.DataFrame
+            Dataframe with unique column names
+        """
+        is_blank = np.array([pd.isna(i) or str(i).strip() == '' for i in data.columns])
+        positions = np.flatnonzero(~(is_blank & data.isna().all().values))
+        data = data.iloc[:, positions]
+        data.columns = ['Unnamed: %d' % position if is_blank[position] else col
+                        for position, col in zip(positions, data.columns)]
+        return self.rename_duplicate_column_names(data)
+
     def rename_duplicate_column_names(self, df):
         # df is the dataframe that you want to rename duplicated columns
         cols = pd.Series(df.columns)
         for dup in cols[cols.duplicated()].unique():
-            cols[cols[cols == dup].index.values.tolist()] = [dup + '_' + str(i) if i != 0 else dup for i in
+            cols[cols[cols == dup].index.values.tolist()] = [str(dup) + '_' + str(i) if i != 0 else dup for i in
                                                              range(sum(cols == dup))]
 
         # rename the columns with the cols list.
@@ -196,8 +303,9 @@ class VMPropsManager(object):
         if headerrows is None:
             headerrows = self.__parameters['shape']['number_of_header_rows']
         # run analysis
-        new_header = data.iloc[skiprows+headerrows-1]
-        data = data.iloc[skiprows+headerrows:,]
+        # rows are located by label, as streamed data starts at the main header row
+        new_header = data.loc[skiprows+headerrows-1]
+        data = data.loc[skiprows+headerrows:,]
         data.columns = new_header
         return data
 
@@ -245,13 +353,10 @@ class VMPropsManager(object):
         if tallycols is None:
             tallycols = self.__parameters['shape']['props_header_tally_first']
         # run analysis
-        col_name_list = []
-        # get row indexes which tally with colnames
+        # get row indexes which tally with colnames, comparing the whole block at once
         sub_data = main_data.iloc[:, skipcols:skipcols + tallycols]
-        for i in list(sub_data.index):
-            if list(sub_data.loc[i].values) == list(sub_data.loc[i].index):
-                col_name_list.append(i)
-        return col_name_list
+        is_header = (sub_data.values == np.array(sub_data.columns, dtype=object)).all(axis=1)
+        return list(sub_data.index[is_header])
 
     def get_split_data(self, data, col_name_list):
         """
@@ -264,18 +369,14 @@ class VMPropsManager(object):
 
         Returns
         -------
+        tables : tuple of pandas.DataFrame
+            len(col_name_list) + 1 tables, each starting at a row of col_name_list
+            (the first one starting at the top of data)
 
         """
         # run analysis
-        if len(col_name_list) == 1:
-            data_1 = data.loc[:col_name_list[0]-1,]
-            data_2 = data.loc[col_name_list[0]:,]
-            return data_1, data_2
-        elif len(col_name_list) == 2:
-            data_1 = data.loc[:col_name_list[0]-1,]
-            data_2 = data.loc[col_name_list[0]:col_name_list[1]-1,]
-            data_3 = data.loc[col_name_list[1]:,]
-            return data_1, data_2, data_3
+        bounds = [0] + [data.index.get_loc(i) for i in col_name_list] + [len(data)]
+        return tuple(data.iloc[start:end, ] for start, end in zip(bounds[:-1], bounds[1:]))
 
     def clean_main_data(self, data, country_col=None, drop_rows_with=None):
         """
@@ -350,15 +451,16 @@ class VMPropsManager(object):
         # fill na with above country (some not merged properly)
         data.loc[:, country_col] = data.loc[:, country_col].ffill()
 
-        # fillna
-        df = data.fillna(0)
-
-        # clear white space cells
-        df = df.applymap(lambda x: 0 if str(x).isspace() else x)
+        # clear white space cells and fillna
+        df = self.normalize_cells(data).fillna(0)
 
-        # format prop columns into numeric
-        for col_idx in range(skipcols_front, df.shape[1]+skipcols_end):
-            df.iloc[:, col_idx] = pd.to_numeric(df.iloc[:, col_idx], errors='coerce')
+        # format prop columns into float arrays in one pass, numbers are kept as they are
+        # and only the remaining text cells are coerced
+        skipcols_end = df.shape[1] + skipcols_end
+        props = df.iloc[:, skipcols_front:skipcols_end]
+        qty = pd.to_numeric(props.values.ravel(), errors='coerce').astype(np.float64)
+        props = pd.DataFrame(qty.reshape(props.shape), index=df.index, columns=props.columns)
+        df = pd.concat([df.iloc[:, :skipcols_front], props, df.iloc[:, skipcols_end:]], axis=1)
 
         # add row sum
         df.loc[max(df.index) + 1] = df.sum(numeric_only=True)
@@ -385,12 +487,7 @@ class VMPropsManager(object):
         return checker
 
     def get_excel_col_from_int(self, n):
-        string = ""
-        n = int(n)
-        while n > 0:
-            n, remainder = divmod(n - 1, 26)
-            string = chr(65 + remainder) + string
-        return string
+        return column_letters(int(n))
     
     def main_table_to_so_converter(self, df, main_cols=None, skipcols_front=None, skipcols_end=None):
         # load parameters if not specified
@@ -403,37 +500,186 @@ class VMPropsManager(object):
         # run analysis
         # get prop column name list from column location
         props_column_names = list(df.iloc[:, skipcols_front:skipcols_end].columns)
-        # melt all props into country
-        df['XRow'] = df.index + 1
-        so_table = pd.melt(df[main_cols + ['XRow'] + props_column_names], id_vars=main_cols + ['XRow'],
-                           value_vars=props_column_names)
-        # rename column names to fixed format
-        so_table.columns = main_cols + ['XRow', 'VM PROPS', 'Qty']
-        # order columns
-        so_table = so_table[main_cols + ['VM PROPS', 'Qty', 'XRow']]
-        # drop props with no qty
-        so_table['Qty'] = pd.to_numeric(so_table['Qty'], errors='coerce')
-        so_table = so_table[so_table['Qty'] > 0]
+        # melt all props into country, prop column after prop column, keeping props with qty only
+        qty = pd.to_numeric(df.iloc[:, skipcols_front:skipcols_end].values.ravel(order='F'), errors='coerce')
+        melt_idx = np.flatnonzero(qty > 0)
+        row_pos, prop_pos = melt_idx % len(df), melt_idx // len(df)
+        # text columns are kept as categoricals, total rows (last row, added by format_main_data)
+        # are renamed through their codes
+        is_total = (df.index.values == max(df.index))[row_pos]
+        so_table = pd.DataFrame(index=range(len(melt_idx)))
+        for col in main_cols:
+            codes, categories = pd.factorize(df[col].values)
+            codes = codes[row_pos]
+            categories = list(categories)
+            if 'TOTAL' not in categories:
+                categories.append('TOTAL')
+            codes[is_total] = categories.index('TOTAL')
+            so_table[col] = pd.Categorical.from_codes(codes, categories=categories)
+        so_table['VM PROPS'] = pd.Categorical.from_codes(prop_pos, categories=props_column_names)
+        so_table['Qty'] = qty[melt_idx]
         # calculate cell location (of original excel)
-        max_rows = len(df)
-        so_table['XCol'] = [skipcols_front + 1 + (i // max_rows) for i in so_table.index]  # quotient
-        so_table['XCol'] = so_table['XCol'].apply(lambda x: self.get_excel_col_from_int(x))
+        so_table['XRow'] = (df.index.values + 1)[row_pos]
+        so_table['XCol'] = column_letters(skipcols_front + 1 + prop_pos)
         so_table['XCell'] = so_table['XCol'] + so_table['XRow'].astype('str')
-        # rename total rows
-        for col in main_cols:
-            so_table.loc[so_table['XRow'] % (max(df.index) + 1) == 0, col] = 'TOTAL'
         # return so format table
-        return so_table.reset_index(drop='True')
+        return so_table
 
     def get_cell_colour_col(self, so_table, original_sheet):
         # run analysis
-        so_table['Cell_Colour'] = so_table['XCell'].apply(lambda x: str(original_sheet[x].fill.start_color.index))
-        so_table['Cell_Colour'] = so_table['Cell_Colour'].apply(lambda x: '00000000' if x == '0' else x)
+        # gather all colours by (row, col)
+        colours = original_sheet.take(so_table['XRow'].values, column_numbers(so_table['XCol']))
+        so_table['Cell_Colour'] = np.where(colours == '0', '00000000', colours)
         # rename total rows
         for col in ['XRow', 'XCol', 'XCell', 'Cell_Colour']:
             so_table.loc[so_table.iloc[:, 0] == 'TOTAL', col] = ''
         return so_table
 
+    def get_stage_parameters(self, stage, streaming=False):
+        """
+        Get the parameters the output of a pipeline stage depends on, besides its input stages
+
+        Parameters
+        ----------
+        stage : str
+            One of PIPELINE_STAGES
+        streaming : bool
+            True if the file is loaded in streaming read-only mode
+
+        Returns
+        -------
+        parameters : dict
+            Parameters used by the stage, by parameter group
+        """
+        stage_parameters = self.__stage_parameters[stage]
+        if stage == 'load' and streaming:
+            stage_parameters = self.__stage_parameters['load_streaming']
+        return {group: {key: self.__parameters[group][key] for key in keys}
+                for group, keys in stage_parameters.items()}
+
+    def run_stage(self, stage, inputs, file_path=None, file_name=None, streaming=False):
+        """
+        Run one stage of the pipeline
+
+        Inputs are not modified, so that they can be kept in a cache
+
+        Parameters
+        ----------
+        stage : str
+            One of PIPELINE_STAGES
+        inputs : dict
+            Outputs of the input stages of the stage, by stage name
+        file_path : str or file-like object
+            VM Props order summary file, for the load stage
+        file_name : str
+            VM Props order summary filename, for the load stage
+        streaming : bool
+            True to load the file in streaming read-only mode
+
+        Returns
+        -------
+        output : object
+            Output of the stage
+        """
+        if stage == 'load':
+            return self.load_dataset(file_path, file_name, import_merged=True, streaming=streaming)
+        elif stage == 'header':
+            return self.get_main_data(inputs['load'][0])
+        elif stage == 'split':
+            # split main and summary
+            main_data = inputs['header']
+            col_name_list = self.get_index_to_split_tables(main_data)
+            data_1, data_2 = self.get_split_data(main_data, col_name_list)[:2]
+            col_name_list = self.get_index_to_split_tables2(data_1)
+            # split main 1 and main 2
+            data_1_head, data_1_body = self.get_split_data(data_1, col_name_list)
+            return data_1_body, data_2
+        elif stage == 'clean':
+            main_data = self.dropna_rows_cols(inputs['split'][0])
+            return self.clean_main_data(main_data.copy())
+        elif stage == 'format':
+            return self.format_main_data(inputs['clean'].copy())
+        elif stage == 'check':
+            # cross check data
+            summary_df = self.shorten_table_w_max_rows(inputs['split'][1])
+            return self.main_and_summary_checker(inputs['format'], summary_df)
+        elif stage == 'convert':
+            return self.main_table_to_so_converter(inputs['format'])
+        elif stage == 'colour':
+            # sheet name carried along, so that a repeat run only needs the check and colour outputs
+            return self.get_cell_colour_col(inputs['convert'].copy(), inputs['load'][1]), inputs['load'][2]
+        raise ValueError('Unknown pipeline stage: %s' % stage)
+
+    def run_pipeline(self, file_path, file_name, streaming=False, progress=None, cache=None, profiler=None):
+        """
+        Convert an order form into its SO and cross checked tables
+
+        progress, if given, is called with the name of each of PIPELINE_STAGES as it starts.
+        With a cache, the output of each stage is kept by hash of the file content, of the
+        parameters the stage depends on and of the outputs of its input stages. A parameter
+        change then only reruns the stages from the first one using it, e.g. a new summary
+        table sum row only reruns the check stage, and the same file with the same parameters
+        returns the cached check and colour outputs at once, even if the larger load output was
+        evicted. With a profiler, the wall time, output shape and peak memory of each stage run
+        are recorded, and the stages taken from the cache
+
+        Parameters
+        ----------
+        file_path : str or file-like object
+            VM Props order summary file
+        file_name : str
+            VM Props order summary filename
+        streaming : bool
+            True to load the file in streaming read-only mode
+        progress : callable
+            Function called with the name of each stage
+        cache : PipelineCache
+            Cache of stage outputs, not used if None
+        profiler : PipelineProfiler
+            Report of the stages, not used if None
+
+        Returns
+        -------
+        so_table : pandas.DataFrame
+            SO table with cell colours
+        checked_data : pandas.DataFrame
+            Cross checked table of main and summary totals
+        sheet_name : str
+            Name of the sheet read
+        """
+        if progress is None:
+            progress = lambda stage: None
+        keys = {}
+        if cache is not None:
+            content_hash = hash_content(file_path)
+            for stage in self.PIPELINE_STAGES:
+                input_keys = [keys[i] for i in self.__stage_inputs[stage]]
+                keys[stage] = make_cache_key(stage, content_hash, streaming, input_keys,
+                                             self.get_stage_parameters(stage, streaming))
+        outputs = {}
+
+        def get_output(stage):
+            if stage not in outputs:
+                output = cache.get(keys[stage]) if cache is not None else None
+                if output is None:
+                    inputs = {i: get_output(i) for i in self.__stage_inputs[stage]}
+                    progress(stage)
+                    if profiler is not None:
+                        output = profiler.measure(stage, self.run_stage, stage, inputs, file_path, file_name,
+                                                  streaming)
+                    else:
+                        output = self.run_stage(stage, inputs, file_path, file_name, streaming)
+                    if cache is not None:
+                        cache.put(keys[stage], output)
+                elif profiler is not None:
+                    profiler.record_cached(stage)
+                outputs[stage] = output
+            return outputs[stage]
+
+        checked_data = get_output('check')
+        so_table, sheet_name = get_output('colour')
+        return so_table, checked_data, sheet_name
+
     def get_file_name(self, sheet_name=None):
         # load parameters if not specified
         if sheet_name is None:
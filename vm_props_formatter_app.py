@@ -7,12 +7,23 @@ import dash_bootstrap_components as dbc
 import dash_html_components as html
 import dash_table as dt
 import io
+import logging
+import os
 import pandas as pd
+import uuid
 import webbrowser
-from dash.dependencies import Input, State, Output
-from flask import send_file
+from dash.dependencies import ClientsideFunction, Input, State, Output
+from flask import Response, abort, escape, request, send_file
 from vm_props_formatter.vm_props_manager import VMPropsManager
-from vm_props_formatter.utils.logger import format_logs
+from vm_props_formatter.utils.file_organizer import check_create_directory, remove_old_files
+from vm_props_formatter.utils.job_queue import JobQueue
+from vm_props_formatter.utils.logger import PipelineProfiler, format_logs
+from vm_props_formatter.utils.pipeline_cache import PipelineCache, hash_content, make_cache_key
+from vm_props_formatter.utils.name_lookup import NameLookup
+from vm_props_formatter.utils.result_store import DiskResultStore, ResultStore
+from vm_props_formatter.utils.report_writer import format_and_save_excel
+from vm_props_formatter.utils.table_exporter import EXPORT_FORMATS, export_table, get_export_formats, iter_csv_chunks
+from vm_props_formatter.utils.table_pager import get_table_page, to_column_payload
 from vm_props_formatter.utils.json_parser import read_json, write_json
 
 # Set up the app
@@ -22,19 +33,29 @@ server = app.server
 app_url = 'http://127.0.0.1:8050/'
 
 # Define global variables
-current_start_analysis_clicks = 0
-current_load_settings_clicks = 0
-current_save_settings_clicks = 0
-current_load_default_settings_clicks = 0
-so_format_data = pd.DataFrame()
-checked_data = pd.DataFrame()
 entity = None
-settings = {}
 settings_path = 'settings/'
 outputs_path = 'outputs/'
+# reports rendered for the app sessions, apart from outputs/reports/ written by the batch converter
+reports_path = outputs_path + 'session_reports/'
+uploads_path = outputs_path + 'uploads/'
 image_filename = 'settings/ck_logo.png'
 encoded_image = base64.b64encode(open(image_filename, 'rb').read())
 analysis_types = [{'label': i, 'value': i} for i in ['Regular', 'Seasonal']]
+analysis_stages = VMPropsManager.PIPELINE_STAGES + ['merge', 'warehouse', 'report']
+job_queue = JobQueue(analysis_stages)
+# Results and settings by session, on disk to share them between several server workers
+if os.environ.get('VM_PROPS_RESULT_STORE') == 'disk':
+    result_store = DiskResultStore(outputs_path + 'sessions/')
+else:
+    result_store = ResultStore()
+# Peak memory of each stage is traced if set, slowing the analysis down
+profile_memory = os.environ.get('VM_PROPS_PROFILE_MEMORY') == '1'
+# Pipeline stage outputs by file content and settings, for repeated runs and settings changes on the same file,
+# and props batch and country-warehouse lookups by file content, bounded to VM_PROPS_CACHE_MB of memory
+pipeline_cache = PipelineCache(float(os.environ.get('VM_PROPS_CACHE_MB', 256)))
+# Rows per page of the SO and checked datatables, only the shown page being sent to the browser
+datatable_page_size = 50
 hover_text = {
     'settings-shape-main-header-row-text':
         ['e.g. Row 8 where the main data row starts'],
@@ -101,6 +122,13 @@ right_output_area_style = {
     'vertical-align': 'top',
     'font-family': 'Helvetica'
 }
+# Page of the large order form upload, shown in a frame
+large_upload_page = """<!DOCTYPE html>
+<html><body style="font-family: Helvetica; margin: 0px;">
+<form method="post" enctype="multipart/form-data">
+<input type="file" name="file" accept=".xlsx,.xlsm"> <input type="submit" value="Upload"> %s
+</form>
+</body></html>"""
 upload_box_style = {
     'width': '100%',
     'height': '60px',
@@ -192,7 +220,7 @@ def generate_datatable(data, id):
 
 def generate_empty_datatable(id, max_cell_width=500):
     """
-    Generate an empty datatable
+    Generate an empty datatable, paged, sorted and filtered on the server
 
     Parameters
     ----------
@@ -208,8 +236,15 @@ def generate_empty_datatable(id, max_cell_width=500):
     """
     return dt.DataTable(
         id=id,
-        sort_action="native",
+        page_action='custom',
+        page_current=0,
+        page_size=datatable_page_size,
+        page_count=1,
+        sort_action='custom',
         sort_mode='multi',
+        sort_by=[],
+        filter_action='custom',
+        filter_query='',
         row_selectable='multi',
         style_header={
             'backgroundColor': 'rgb(220, 220, 220)',
@@ -260,6 +295,56 @@ def generate_file_error_message(filenames):
     )
 
 
+def generate_timings_panel(timings):
+    """
+    Generate the collapsible panel of the analysis stage timings
+
+    Parameters
+    ----------
+    timings : list of dict
+        Stage, seconds, rows, cols, peak MB and whether it was cached, by stage
+
+    Returns
+    -------
+    output : dash_html_components.Details
+        Timings panel
+    """
+    return html.Details(
+        children=[
+            html.Summary('Timings (%.2fs)' % sum(i['seconds'] for i in timings)),
+            generate_datatable(pd.DataFrame(timings), 'timings-datatable')
+        ]
+    )
+
+
+def generate_export_links(session_id):
+    """
+    Generate the links to export the SO and checked tables without Excel formatting
+
+    Parameters
+    ----------
+    session_id : str
+        Session ID
+
+    Returns
+    -------
+    output : list of dash_html_components
+        Export links by table
+    """
+    output = []
+    for table, label in [('so', 'Export SO table: '), ('checks', 'Export checks: ')]:
+        output += [html.Br(), label]
+        for i, file_format in enumerate(get_export_formats()):
+            if i > 0:
+                output.append(' | ')
+            output.append(html.A(
+                file_format.upper(),
+                id='export-%s-%s-link' % (table, file_format),
+                href='/downloads/export/?session=%s&table=%s&format=%s' % (session_id, table, file_format)
+            ))
+    return output
+
+
 def generate_no_error_message():
     """
     Generate no error message
@@ -279,6 +364,48 @@ def generate_no_error_message():
     )
 
 
+def generate_progress_message(job_status):
+    """
+    Generate analysis progress message
+
+    Parameters
+    ----------
+    job_status : dict
+        Job status from the job queue
+
+    Returns
+    -------
+    output : dash_html_components.Div
+        Progress message
+    """
+    if job_status['stage'] is None:
+        message = 'Status: Waiting for the analysis to start ...'
+    else:
+        message = 'Status: Running %s (%d/%d) ...' % (job_status['stage'], job_status['stage_number'],
+                                                      job_status['stages_count'])
+    return html.Div(
+        children=[html.P(message)],
+        style=center_placement_style
+    )
+
+
+def is_triggered_by(prop_id):
+    """
+    Check if the running callback was triggered by a component property
+
+    Parameters
+    ----------
+    prop_id : str
+        Component ID and property, e.g. 'start-order-check-button.n_clicks'
+
+    Returns
+    -------
+    output : bool
+        True if the property triggered the callback
+    """
+    return prop_id in [triggered['prop_id'] for triggered in dash.callback_context.triggered]
+
+
 def generate_hover_text(target_name):
     return dbc.Tooltip(
         hover_text[target_name],
@@ -312,7 +439,7 @@ def generate_slider(id, min_v=0, max_v=20, m=5):
     )
 
 # Define app layout
-app.layout = html.Div(
+app_body = html.Div(
     id='app-body',
     children=[
         html.Div([
@@ -353,6 +480,25 @@ app.layout = html.Div(
                                             id='upload-vm-props-order-summary',
                                             style=upload_box_style
                                         ),
+                                        html.Details(
+                                            children=[
+                                                html.Summary('Large file? Upload it to the server directly'),
+                                                html.Iframe(
+                                                    id='large-upload-frame',
+                                                    style={'border': 'none', 'width': '100%', 'height': '30px'}
+                                                ),
+                                                dcc.Checklist(
+                                                    id='streaming-checklist',
+                                                    options=[{'label': ' Read it in low memory mode',
+                                                              'value': 'streaming'}],
+                                                    value=['streaming']
+                                                ),
+                                                html.P('Low memory mode only reads the rows from the main header to '
+                                                       'the summary table: cells merged from above the main header '
+                                                       'are left blank.',
+                                                       style={'fontSize': 'small'})
+                                            ]
+                                        ),
                                         html.P('Country-Warehouse Naming File'),
                                         dcc.Upload(
                                             id='upload-country-whs-names',
@@ -375,6 +521,21 @@ app.layout = html.Div(
                                             ],
                                             style=center_placement_style
                                         ),
+                                        html.Div(
+                                            id='analysis-progress-area',
+                                            style=center_placement_style
+                                        ),
+                                        html.Div(
+                                            id='analysis-timings-area'
+                                        ),
+                                        dcc.Store(
+                                            id='analysis-job-store'
+                                        ),
+                                        dcc.Interval(
+                                            id='analysis-job-interval',
+                                            interval=1000,
+                                            disabled=True
+                                        ),
                                         html.P(''),
                                         html.Div(
                                             id='download-report-area',
@@ -401,6 +562,9 @@ app.layout = html.Div(
                                                                 html.Div(
                                                                     [generate_empty_datatable('so-format-datatable')],
                                                                     style=center_placement_style
+                                                                ),
+                                                                dcc.Store(
+                                                                    id='so-format-datatable-page'
                                                                 )
                                                             ]
                                                         ),
@@ -411,6 +575,9 @@ app.layout = html.Div(
                                                                 html.Div(
                                                                     [generate_empty_datatable('checked-datatable')],
                                                                     style=center_placement_style
+                                                                ),
+                                                                dcc.Store(
+                                                                    id='checked-datatable-page'
                                                                 )
                                                             ]
                                                         )
@@ -663,6 +830,56 @@ app.layout = html.Div(
     ]
 )
 
+
+
+def serve_layout():
+    """
+    Serve the app layout with a new session ID on each page load
+
+    Parameters
+    ----------
+    None
+
+    Returns
+    -------
+    output : dash_html_components.Div
+        App layout
+    """
+    return html.Div(
+        children=[
+            dcc.Store(
+                id='session-id',
+                data=uuid.uuid4().hex
+            ),
+            app_body
+        ]
+    )
+
+
+app.layout = serve_layout
+
+
+@app.callback(
+    Output('large-upload-frame', 'src'),
+    [Input('session-id', 'data')]
+)
+def display_large_upload_form(session_id):
+    """
+    Display the large order form upload page of the session
+
+    Parameters
+    ----------
+    session_id : str
+        Session ID
+
+    Returns
+    -------
+    output : str
+        Upload page URL
+    """
+    return '/uploads/?session=' + session_id
+
+
 @app.callback(
     Output('upload-vm-props-order-summary', 'children'),
     [Input('upload-vm-props-order-summary', 'contents')],
@@ -793,13 +1010,16 @@ def update_settings_dropdown(country_col, store_col, storesap_col):
         Input('settings-names-storesap-col-input', 'value'),
         Input('settings-names-main-cols-dropdown', 'value'),
         Input('settings-names-entity-list-dropdown', 'value')
+    ],
+    [
+        State('session-id', 'data')
     ]
 )
 def update_settings(main_header_row, props_header_start_col, number_of_header_rows, props_header_tally_first,
                     no_summary_table_rows, summary_table_sum_row, props_header_end_col, sheet_name, country_col,
-                    store_col, storesap_col, main_cols, entity_list):
+                    store_col, storesap_col, main_cols, entity_list, session_id):
     # load settings
-    global settings
+    settings = (result_store.get(session_id, ['settings']) or {}).get('settings', {})
     
     # define texts
     main_header_row_text = 'SkipRows to Main Header'
@@ -859,6 +1079,7 @@ def update_settings(main_header_row, props_header_start_col, number_of_header_ro
         settings['names']['storesap_col'] = storesap_col
         settings['names']['main_cols'] = main_cols
         settings['names']['entity_list'] = entity_list
+        result_store.update(session_id, {'settings': settings})
         
     # return texts
     return main_header_row_text, props_header_start_col_text, number_of_header_rows_text, props_header_tally_first_text, \
@@ -870,19 +1091,20 @@ def update_settings(main_header_row, props_header_start_col, number_of_header_ro
     [
         Input('settings-save-button', 'n_clicks'),
         Input('settings-type-dropdown', 'value')
+    ],
+    [
+        State('session-id', 'data')
     ]
 )
-def save_settings(save_settings_clicks, analysis_type):
+def save_settings(save_settings_clicks, analysis_type, session_id):
     """"""
-    global current_save_settings_clicks
-    global settings
-    if save_settings_clicks > current_save_settings_clicks:
+    settings = (result_store.get(session_id, ['settings']) or {}).get('settings', {})
+    if is_triggered_by('settings-save-button.n_clicks') and len(settings) > 0:
         if analysis_type == 'Regular':
             filename = settings_path + 'regular_settings.json'
         elif analysis_type == 'Seasonal':
             filename = settings_path + 'seasonal_settings.json'
         write_json(settings, filename)
-        current_save_settings_clicks = save_settings_clicks
     return None
 
 @app.callback(
@@ -906,29 +1128,28 @@ def save_settings(save_settings_clicks, analysis_type):
         Input('settings-load-button', 'n_clicks'),
         Input('default-settings-load-button', 'n_clicks'),
         Input('settings-type-dropdown', 'value')
+    ],
+    [
+        State('session-id', 'data')
     ]
 )
-def load_settings(load_settings_clicks, load_default_settings_clicks, analysis_type):
-    global current_load_settings_clicks
-    global current_load_default_settings_clicks
-    global settings
-    if load_settings_clicks is not None and load_settings_clicks > 0 and load_settings_clicks > current_load_settings_clicks:
+def load_settings(load_settings_clicks, load_default_settings_clicks, analysis_type, session_id):
+    if is_triggered_by('settings-load-button.n_clicks'):
         print('[Status]', datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"), ' Loading the settings ...')
         if analysis_type == 'Regular':
             filename = settings_path + 'regular_settings.json'
         elif analysis_type == 'Seasonal':
             filename = settings_path + 'seasonal_settings.json'
         values = read_json(filename)
-        current_load_settings_clicks = load_settings_clicks
-    elif load_default_settings_clicks is not None and load_default_settings_clicks > 0 and load_default_settings_clicks > current_load_default_settings_clicks:
+    elif is_triggered_by('default-settings-load-button.n_clicks'):
         print('[Status]', datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"), ' Loading the default settings ...')
         values = VMPropsManager().get_default_parameters()
-        current_load_default_settings_clicks = load_default_settings_clicks
     else:
         values = None
     print('[Status]', datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"), ' Loaded settings: ', values)
     if values is not None:
         settings = values
+        result_store.update(session_id, {'settings': settings})
         return \
             settings['shape']['main_header_row'],\
             settings['shape']['props_header_start_col'], \
@@ -947,16 +1168,261 @@ def load_settings(load_settings_clicks, load_default_settings_clicks, analysis_t
         return None, None, None, None, None, None, None, None, None, None, None, [], []
 
 
+def analyse_order_form(session_id, run_id, settings, vm_props_order_summary_content, vm_props_order_summary_filename,
+                       vm_props_order_summary_path, props_batch_content, props_batch_content_filename,
+                       country_whs_content, country_whs_content_filename, progress, streaming=False):
+    """
+    Convert the uploaded order form and render its report, run as a background job storing its
+    results with the session
+
+    Parameters
+    ----------
+    session_id : str
+        Session ID
+    run_id : str
+        ID of the analysis run, stored with the results
+    settings : dict
+        Settings of the analysis type
+    vm_props_order_summary_content : str
+        VM Props order summary file
+    vm_props_order_summary_filename : str
+        VM Props order summary filename
+    vm_props_order_summary_path : str
+        VM Props order summary file uploaded to the server, used instead of the content if given
+    props_batch_content : str
+        VM Props batch naming file
+    props_batch_content_filename : str
+        VM Props batch naming filename
+    country_whs_content : str
+        Country-warehouse naming file
+    country_whs_content_filename : str
+        Country-warehouse naming filename
+    progress : callable
+        Function called with the name of each stage
+    streaming : bool
+        True to read the order form in low memory mode, see VMPropsManager.load_dataset
+
+    Returns
+    -------
+    None
+    """
+    profiler = PipelineProfiler(vm_props_order_summary_filename, trace_memory=profile_memory)
+    try:
+        so_format_data, checked_data, sheet_name = convert_order_form(
+            settings, vm_props_order_summary_content, vm_props_order_summary_filename, vm_props_order_summary_path,
+            props_batch_content, props_batch_content_filename, country_whs_content, country_whs_content_filename,
+            progress, profiler, streaming)
+    except Exception as error:
+        profiler.log()
+        result_store.update(session_id, {'error': repr(error), 'run_id': run_id})
+        raise
+    # run ID last, as the poll takes the results once it finds it
+    result_store.update(session_id, {
+        'error': None,
+        'so_format_data': so_format_data,
+        'checked_data': checked_data,
+        'sheet_name': sheet_name,
+        'report': None,
+        'timings': list(profiler.stages),
+        'run_id': run_id
+    })
+    # render the report once into a file, row by row to keep memory flat, so that downloads
+    # send it as it is
+    progress('report')
+    check_create_directory(reports_path)
+    remove_old_files(reports_path + '*.xlsx', result_store.ttl_seconds)
+    report = os.path.abspath(reports_path + run_id + '.xlsx')
+    try:
+        profiler.measure('report', format_and_save_excel, checked_data, so_format_data, report,
+                         constant_memory=True)
+    except Exception as error:
+        profiler.log()
+        if os.path.isfile(report):
+            os.remove(report)
+        if (result_store.get(session_id, ['run_id']) or {}).get('run_id') == run_id:
+            result_store.update(session_id, {'error': repr(error)})
+        raise
+    profiler.log()
+    if (result_store.get(session_id, ['run_id']) or {}).get('run_id') == run_id:
+        result_store.update(session_id, {'report': report})
+    else:
+        os.remove(report)  # replaced by a newer run of the session
+
+
+def convert_order_form(settings, vm_props_order_summary_content, vm_props_order_summary_filename,
+                       vm_props_order_summary_path, props_batch_content, props_batch_content_filename,
+                       country_whs_content, country_whs_content_filename, progress, profiler=None, streaming=False):
+    """
+    Convert the uploaded order form
+
+    Parameters
+    ----------
+    settings : dict
+        Settings of the analysis type
+    vm_props_order_summary_content : str
+        VM Props order summary file
+    vm_props_order_summary_filename : str
+        VM Props order summary filename
+    vm_props_order_summary_path : str
+        VM Props order summary file uploaded to the server, used instead of the content if given
+    props_batch_content : str
+        VM Props batch naming file
+    props_batch_content_filename : str
+        VM Props batch naming filename
+    country_whs_content : str
+        Country-warehouse naming file
+    country_whs_content_filename : str
+        Country-warehouse naming filename
+    progress : callable
+        Function called with the name of each stage
+    profiler : PipelineProfiler
+        Report of the stages, not used if None
+    streaming : bool
+        True to read the order form in low memory mode, see VMPropsManager.load_dataset
+
+    Returns
+    -------
+    so_format_data : pandas.DataFrame
+        SO table
+    checked_data : pandas.DataFrame
+        Cross checked table
+    sheet_name : str
+        Name of the sheet read
+    """
+    if vm_props_order_summary_path is not None:
+        # read from disk, without holding the file in memory
+        vm_props_order_summary_file = vm_props_order_summary_path
+    else:
+        vm_props_order_summary_file = io.BytesIO(base64.b64decode(vm_props_order_summary_content.split(',')[-1]))
+    # Initialise
+    vm = VMPropsManager(settings)
+    # Run analysis
+    so_format_data, checked_data, sheet_name = vm.run_pipeline(
+        vm_props_order_summary_file, vm_props_order_summary_filename, streaming=streaming, progress=progress,
+        cache=pipeline_cache, profiler=profiler)
+    # add VM Batch Props Tag if file is uploaded / file exists
+    if None not in (props_batch_content, props_batch_content_filename):
+        progress('merge')
+        if profiler is not None:
+            so_format_data = profiler.measure('merge', merge_props_batch, vm, so_format_data, props_batch_content,
+                                              props_batch_content_filename)
+        else:
+            so_format_data = merge_props_batch(vm, so_format_data, props_batch_content, props_batch_content_filename)
+    # add the warehouse of each country if file is uploaded
+    if None not in (country_whs_content, country_whs_content_filename):
+        progress('warehouse')
+        country_col = settings['names']['country_col']
+        if profiler is not None:
+            so_format_data = profiler.measure('warehouse', merge_country_whs, vm, so_format_data, country_col,
+                                              country_whs_content, country_whs_content_filename)
+        else:
+            so_format_data = merge_country_whs(vm, so_format_data, country_col, country_whs_content,
+                                               country_whs_content_filename)
+    return so_format_data, checked_data, sheet_name
+
+
+def load_name_lookup(vm, content, filename, key_col):
+    """
+    Parse an uploaded naming file into a lookup by name, cached by file content as the same file is
+    uploaded from one order form to the next
+
+    Parameters
+    ----------
+    vm : VMPropsManager
+        VM Props manager of the analysis
+    content : str
+        Naming file
+    filename : str
+        Naming filename
+    key_col : str
+        Name column, matched with the file headers regardless of case
+
+    Returns
+    -------
+    lookup : NameLookup
+        Naming list by name, shared with other runs and not to be modified
+    """
+    file = io.BytesIO(base64.b64decode(content.split(',')[-1]))
+    cache_key = make_cache_key('name_lookup', hash_content(file), os.path.splitext(filename)[1].lower(), key_col)
+    lookup = pipeline_cache.get(cache_key)
+    if lookup is None:
+        # first visible sheet, whatever the sheet of the order form in the settings
+        data = vm.load_dataset(file, filename, file_only=True, sheet_name='', header=0)
+        data = data.rename(columns={i: key_col for i in data.columns if str(i).upper().strip() == key_col.upper()})
+        lookup = NameLookup(data, key_col)
+        pipeline_cache.put(cache_key, lookup)
+        if lookup.duplicated_names:
+            print('[Status] Names listed more than once in ', filename, ', first row taken: ',
+                  ', '.join(lookup.duplicated_names))
+            logging.warning('Duplicated names in %s: %s', filename, lookup.duplicated_names)
+    return lookup
+
+
+def merge_props_batch(vm, so_format_data, props_batch_content, props_batch_content_filename):
+    """
+    Add the VM Props batch names to the SO table
+
+    Parameters
+    ----------
+    vm : VMPropsManager
+        VM Props manager of the analysis
+    so_format_data : pandas.DataFrame
+        SO table
+    props_batch_content : str
+        VM Props batch naming file
+    props_batch_content_filename : str
+        VM Props batch naming filename
+
+    Returns
+    -------
+    so_format_data : pandas.DataFrame
+        SO table with the batch names
+    """
+    props_batch = load_name_lookup(vm, props_batch_content, props_batch_content_filename, 'Product Name')
+    so_format_data, unmatched_names = props_batch.apply(so_format_data, 'VM PROPS')
+    if unmatched_names:
+        print('[Status] Props not found in the batch file: ', len(unmatched_names), ', e.g. ',
+              ', '.join(unmatched_names[:5]))
+        logging.warning('Unmatched props batch names in %s: %s', props_batch_content_filename, unmatched_names)
+    return so_format_data
+
+
+def merge_country_whs(vm, so_format_data, country_col, country_whs_content, country_whs_content_filename):
+    """
+    Add the warehouse / ship-to columns of each country to the SO table
+
+    Parameters
+    ----------
+    vm : VMPropsManager
+        VM Props manager of the analysis
+    so_format_data : pandas.DataFrame
+        SO table
+    country_col : str
+        Country column, in the SO table and in the country-warehouse naming file
+    country_whs_content : str
+        Country-warehouse naming file
+    country_whs_content_filename : str
+        Country-warehouse naming filename
+
+    Returns
+    -------
+    so_format_data : pandas.DataFrame
+        SO table with the warehouse columns, blank on TOTAL rows
+    """
+    # SO headers are upper-cased by the pipeline
+    country_col = next((i for i in so_format_data.columns if str(i).upper() == country_col.upper()), country_col)
+    country_whs = load_name_lookup(vm, country_whs_content, country_whs_content_filename, country_col)
+    so_format_data, unmatched_names = country_whs.apply(so_format_data, country_col)
+    unmatched_names = [i for i in unmatched_names if i != 'TOTAL']
+    if unmatched_names:
+        print('[Status] Countries not found in the country-warehouse file: ', len(unmatched_names), ', e.g. ',
+              ', '.join(unmatched_names[:5]))
+        logging.warning('Unmatched countries in %s: %s', country_whs_content_filename, unmatched_names)
+    return so_format_data
+
+
 @app.callback(
-    [
-        Output('so-format-datatable', 'data'),
-        Output('so-format-datatable', 'columns'),
-        Output('so-format-datatable', 'selected_rows'),
-        Output('checked-datatable', 'data'),
-        Output('checked-datatable', 'columns'),
-        Output('checked-datatable', 'selected_rows'),
-        Output('download-report-area', 'children')
-    ],
+    Output('analysis-job-store', 'data'),
     [
         Input('upload-vm-props-order-summary', 'contents'),
         Input('upload-country-whs-names', 'contents'),
@@ -968,109 +1434,148 @@ def load_settings(load_settings_clicks, load_default_settings_clicks, analysis_t
         State('upload-vm-props-order-summary', 'filename'),
         State('upload-country-whs-names', 'filename'),
         State('upload-props-batch-names', 'filename'),
+        State('streaming-checklist', 'value'),
+        State('session-id', 'data')
     ]
 )
 def run_analysis(vm_props_order_summary_content, country_whs_content, props_batch_content, start_analysis_clicks,
-                 analysis_type, vm_props_order_summary_filename, country_whs_content_filename, props_batch_content_filename):
+                 analysis_type, vm_props_order_summary_filename, country_whs_content_filename, props_batch_content_filename,
+                 streaming_options, session_id):
     """
-    Perform checking of the files
+    Queue the checking of the files as a background job
 
     Parameters
     ----------
     vm_props_order_summary_content : str
         VM Props order summary file
-    purchase_order_summary_content : str
-        Purchase order summary file
-    po_details_summary_content : str
-        Po details summary file
-    repeat_order_content : str
-        Repeat order file
-    business_rules_content : str
-        Business rules file
+    country_whs_content : str
+        Country-warehouse naming file
+    props_batch_content : str
+        VM Props batch naming file
     start_analysis_clicks : int
         Total clicks of start button
+    analysis_type : str
+        Regular or Seasonal
     vm_props_order_summary_filename : str
         VM Props order summary filename
+    country_whs_content_filename : str
+        Country-warehouse naming filename
+    props_batch_content_filename : str
+        VM Props batch naming filename
+    streaming_options : list of str
+        ['streaming'] to read the order form uploaded to the server in low memory mode
+    session_id : str
+        Session ID
 
     Returns
     -------
-    duplicated_output : list
-        List of visualization outputs for duplicated data row check
-    download_report_output: list
-        Report download link
+    job : dict
+        Job ID, run ID and filename of the queued analysis, None if no analysis is queued
     """
-    global current_start_analysis_clicks
-    global so_format_data
-    global checked_data
-    global settings
-    global sheet_name
-    
-    so_format_datatable_data = {}
-    so_format_datatable_columns = []
-    checked_datatable_data = {}
-    checked_datatable_columns = []
-    download_report_output = []
-    are_outputs_available = False
-
-    if None not in (analysis_type, vm_props_order_summary_content, vm_props_order_summary_filename, start_analysis_clicks) \
-            and start_analysis_clicks > 0 and start_analysis_clicks > current_start_analysis_clicks:
+    job = None
+
+    # take the order form uploaded to the server if none is dropped in the browser
+    vm_props_order_summary_path = None
+    if vm_props_order_summary_content is None and is_triggered_by('start-order-check-button.n_clicks'):
+        upload = (result_store.get(session_id, ['upload']) or {}).get('upload')
+        if upload is not None and os.path.isfile(upload['path']):
+            vm_props_order_summary_path = upload['path']
+            vm_props_order_summary_filename = upload['filename']
+
+    if None not in (analysis_type, vm_props_order_summary_filename) \
+            and (vm_props_order_summary_content is not None or vm_props_order_summary_path is not None) \
+            and is_triggered_by('start-order-check-button.n_clicks'):
         if analysis_type == 'Regular':
             filename = settings_path + 'regular_settings.json'
         elif analysis_type == 'Seasonal':
             filename = settings_path + 'seasonal_settings.json'
         settings = read_json(filename)
         print('[Status]', datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"), ' Updating the settings ...')
-        
-        # Run checking
-        if None not in (vm_props_order_summary_content, vm_props_order_summary_filename):
-            vm_props_order_summary_file = io.BytesIO(base64.b64decode(vm_props_order_summary_content.split(',')[-1]))
-        else:
-            vm_props_order_summary_file = None
-            
-        if None not in (vm_props_order_summary_file, vm_props_order_summary_filename):
-            # Initialise
-            vm = VMPropsManager(settings)
-            # Run analysis
-            print('[Status]', datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"), ' Updating the settings ...')
-            data, data_sh_colours, sheet_name = vm.load_dataset(
-                vm_props_order_summary_file, vm_props_order_summary_filename, import_merged=True)
-            main_data = vm.get_main_data(data)
-            # split main and summary
-            col_name_list = vm.get_index_to_split_tables(main_data)
-            if len(col_name_list) == 1:
-                data_1, data_2 = vm.get_split_data(main_data, col_name_list)
-            elif len(col_name_list) == 2:
-                data_1, data_2, data_3 = vm.get_split_data(main_data, col_name_list)
-            col_name_list = vm.get_index_to_split_tables2(data_1)
-            # split main 1 and main 2
-            data_1_head, data_1_body = vm.get_split_data(data_1, col_name_list)
-            # clean and format data
-            main_data = vm.dropna_rows_cols(data_1_body)
-            main_data_clean = vm.clean_main_data(main_data.copy())
-            df = vm.format_main_data(main_data_clean)
-            summary_df = vm.shorten_table_w_max_rows(data_2)
-            # cross check data
-            checked_data = vm.main_and_summary_checker(df, summary_df)
-            # export format
-            so_table = vm.main_table_to_so_converter(df)
-            so_format_data = vm.get_cell_colour_col(so_table, data_sh_colours)
-            # add VM Batch Props Tag if file is uploaded / file exists
-            if None not in (props_batch_content, props_batch_content_filename):
-                props_batch_content_file = io.BytesIO(base64.b64decode(props_batch_content.split(',')[-1]))
-                b_data = vm.load_dataset(props_batch_content_file, props_batch_content_filename,
-                                         file_only=True, sheet_name=None, header=0)
-                b_data = b_data.applymap(lambda x: str(x).upper().strip())
-                so_format_data = so_format_data.merge(b_data, how='left', right_on='Product Name', left_on='VM PROPS')
-                del(so_format_data['Product Name'])
+
+        # Queue checking
+        run_id = uuid.uuid4().hex
+        job_id = job_queue.submit(analyse_order_form, session_id, run_id, settings, vm_props_order_summary_content,
+                                  vm_props_order_summary_filename, vm_props_order_summary_path, props_batch_content,
+                                  props_batch_content_filename, country_whs_content, country_whs_content_filename,
+                                  streaming=vm_props_order_summary_path is not None
+                                  and 'streaming' in (streaming_options or []))
+        job = {'job_id': job_id, 'run_id': run_id, 'filename': vm_props_order_summary_filename}
+        print('[Status]', datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"), ' Analysis queued: ', job_id)
+
+    return job
+
+
+@app.callback(
+    [
+        Output('so-format-datatable', 'columns'),
+        Output('so-format-datatable', 'selected_rows'),
+        Output('so-format-datatable', 'page_current'),
+        Output('checked-datatable', 'columns'),
+        Output('checked-datatable', 'selected_rows'),
+        Output('checked-datatable', 'page_current'),
+        Output('download-report-area', 'children'),
+        Output('analysis-progress-area', 'children'),
+        Output('analysis-timings-area', 'children'),
+        Output('analysis-job-interval', 'disabled')
+    ],
+    [
+        Input('analysis-job-interval', 'n_intervals'),
+        Input('analysis-job-store', 'data')
+    ],
+    [
+        State('session-id', 'data')
+    ]
+)
+def poll_analysis(n_intervals, job, session_id):
+    """
+    Show the progress of the queued analysis, then its outputs once done
+
+    Parameters
+    ----------
+    n_intervals : int
+        Number of polls
+    job : dict
+        Job ID, run ID and filename of the queued analysis
+    session_id : str
+        Session ID
+
+    Returns
+    -------
+    outputs : list
+        Datatable columns, report download link, progress message, timings panel and whether to stop polling,
+        the datatable rows being paged from the stored results by update_datatable_page
+    """
+    so_format_datatable_columns = []
+    checked_datatable_columns = []
+    download_report_output = []
+    timings_output = []
+    are_outputs_available = False
+
+    job_status = job_queue.get_status(job['job_id']) if job is not None else None
+    results = result_store.get(session_id, ['run_id', 'error']) if job is not None else None
+    is_stored = results is not None and results.get('run_id') == job['run_id']
+    if job is not None and not is_stored and job_status is not None and job_status['status'] in ('queued', 'running'):
+        return dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update, \
+               dash.no_update, generate_progress_message(job_status), dash.no_update, False
+    elif job is not None and not is_stored and job_status is None:
+        # job queued on another server worker, wait for its results
+        return dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update, \
+               dash.no_update, generate_progress_message({'stage': None}), dash.no_update, False
+    elif job is not None and (not is_stored or results.get('error') is not None):
+        job_queue.pop_result(job['job_id'])
+        download_report_output = generate_file_error_message(job['filename'])
+    elif job is not None:
+        # tables are shown while the report is still rendering
+        job_queue.pop_result(job['job_id'])
+        # the tables are read once, when the run is done
+        results = result_store.get(session_id) or {}
+        so_format_data = results.get('so_format_data')
+        checked_data = results.get('checked_data')
         # Format outputs
         if so_format_data is not None and not so_format_data.empty:
-            # table not showing until second click
-            so_format_datatable_data = so_format_data.to_dict('rows')
             so_format_datatable_columns = [{'name': i, 'id': i} for i in so_format_data.columns]
             are_outputs_available = True
         if checked_data is not None and not checked_data.empty:
-            # table not showing until second click; why?
-            checked_datatable_data = checked_data.to_dict('rows')
             checked_datatable_columns = [{'name': i, 'id': i} for i in checked_data.columns]
             are_outputs_available = True
         # Generate report download link
@@ -1079,15 +1584,152 @@ def run_analysis(vm_props_order_summary_content, country_whs_content, props_batc
                 html.A(
                     'Download report',
                     id='download-report-link',
-                    href='/downloads/'
+                    href='/downloads/?session=' + session_id
                 )
-            ]
-        # Update current clicks
-        current_start_analysis_clicks = start_analysis_clicks
+            ] + generate_export_links(session_id)
+        if results.get('timings'):
+            timings_output = generate_timings_panel(results['timings'])
         print('[Status]', datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"), ' Analysis complete!')
 
-    return so_format_datatable_data, so_format_datatable_columns, [], checked_datatable_data, \
-           checked_datatable_columns, [], download_report_output
+    return so_format_datatable_columns, [], 0, checked_datatable_columns, [], 0, download_report_output, [], \
+           timings_output, True
+
+
+def update_datatable_page(session_id, results_key, page_current, page_size, sort_by, filter_query):
+    """
+    Get the shown page of a datatable from the stored results of the session, column oriented
+
+    Parameters
+    ----------
+    session_id : str
+        Session ID
+    results_key : str
+        Stored results table, 'so_format_data' or 'checked_data'
+    page_current : int
+        Page number, 0-based
+    page_size : int
+        Number of rows per page
+    sort_by : list of dict
+        Sorted columns
+    filter_query : str
+        Filter query
+
+    Returns
+    -------
+    page : dict
+        Cells of the page by column, see to_column_payload, None if there is no table
+    page_count : int
+        Number of pages
+    """
+    results = result_store.get(session_id, [results_key]) or {}
+    df = results.get(results_key)
+    if df is None or df.empty:
+        return None, 1
+    page, page_count = get_table_page(df, page_current, page_size, sort_by, filter_query)
+    return to_column_payload(page), page_count
+
+
+@app.callback(
+    [
+        Output('so-format-datatable-page', 'data'),
+        Output('so-format-datatable', 'page_count')
+    ],
+    [
+        Input('so-format-datatable', 'columns'),
+        Input('so-format-datatable', 'page_current'),
+        Input('so-format-datatable', 'page_size'),
+        Input('so-format-datatable', 'sort_by'),
+        Input('so-format-datatable', 'filter_query')
+    ],
+    [
+        State('session-id', 'data')
+    ]
+)
+def update_so_format_datatable_page(columns, page_current, page_size, sort_by, filter_query, session_id):
+    """
+    Show a page of the SO table, on new results, paging, sorting or filtering
+
+    Parameters
+    ----------
+    columns : list of dict
+        Datatable columns, set on new results
+    page_current : int
+        Page number, 0-based
+    page_size : int
+        Number of rows per page
+    sort_by : list of dict
+        Sorted columns
+    filter_query : str
+        Filter query
+    session_id : str
+        Session ID
+
+    Returns
+    -------
+    page : dict
+        Cells of the page by column, rebuilt into rows in the browser
+    page_count : int
+        Number of pages
+    """
+    if not columns:
+        return None, 1
+    return update_datatable_page(session_id, 'so_format_data', page_current, page_size, sort_by, filter_query)
+
+
+@app.callback(
+    [
+        Output('checked-datatable-page', 'data'),
+        Output('checked-datatable', 'page_count')
+    ],
+    [
+        Input('checked-datatable', 'columns'),
+        Input('checked-datatable', 'page_current'),
+        Input('checked-datatable', 'page_size'),
+        Input('checked-datatable', 'sort_by'),
+        Input('checked-datatable', 'filter_query')
+    ],
+    [
+        State('session-id', 'data')
+    ]
+)
+def update_checked_datatable_page(columns, page_current, page_size, sort_by, filter_query, session_id):
+    """
+    Show a page of the checked table, on new results, paging, sorting or filtering
+
+    Parameters
+    ----------
+    columns : list of dict
+        Datatable columns, set on new results
+    page_current : int
+        Page number, 0-based
+    page_size : int
+        Number of rows per page
+    sort_by : list of dict
+        Sorted columns
+    filter_query : str
+        Filter query
+    session_id : str
+        Session ID
+
+    Returns
+    -------
+    page : dict
+        Cells of the page by column, rebuilt into rows in the browser
+    page_count : int
+        Number of pages
+    """
+    if not columns:
+        return None, 1
+    return update_datatable_page(session_id, 'checked_data', page_current, page_size, sort_by, filter_query)
+
+
+# Rebuild the datatable rows from the column oriented page in the browser, see assets/datatable_page.js
+for datatable_id in ['so-format-datatable', 'checked-datatable']:
+    app.clientside_callback(
+        ClientsideFunction(namespace='vm_props', function_name='records_from_columns'),
+        Output(datatable_id, 'data'),
+        [Input(datatable_id + '-page', 'data')]
+    )
 
 
 # Download the report
@@ -1105,53 +1747,15 @@ def download_report():
     send_file : flask.send_file
         File sending function
     """
-    global so_format_data
-    global checked_data
-    global sheet_name
-
-    def format_and_save_excel(summary_df, so_table, keep_cols=None):
-
-        buffer = io.BytesIO()
-
-        if keep_cols is not None:
-            so_table = so_table[keep_cols]
-
-        # Create a Pandas Excel writer using XlsxWriter as the engine.
-        writer = pd.ExcelWriter(buffer, engine='xlsxwriter')
-
-        # Convert dataframes to an XlsxWriter Excel object. 
-        so_table.to_excel(writer, sheet_name='SO_Table', encoding='utf8')
-        summary_df.to_excel(writer, sheet_name='Summary', encoding='utf8')
-
-        # Get the xlsxwriter workbook and worksheet objects.
-        workbook = writer.book
-        worksheet = writer.sheets['SO_Table']
-
-        for i in list(so_table[so_table['Cell_Colour'] != '00000000'].index):
-            hex_code = '#' + str(so_table['Cell_Colour'].loc[i][-6:])
-            cell_format = workbook.add_format()
-            cell_format.set_pattern(1)
-            cell_format.set_bg_color(hex_code)
-            worksheet.set_row(i + 1,  # +1 due to cells start from 1 but python 0
-                              None,  # do not change row height
-                              cell_format  # add bg colour
-                              )
-
-        for i in list(so_table[so_table.iloc[:, 0] == 'TOTAL'].index):
-            cell_format = workbook.add_format({'bold': True, 'border': 3})
-            cell_format.set_pattern(1)
-            cell_format.set_bg_color('#e5e5e5')
-            worksheet.set_row(i + 1,  # +1 due to cells start from 1 but python 0
-                              None,  # do not change row height
-                              cell_format  # add bold and grey bg for row
-                              )
-
-        # Close the Pandas Excel writer and output the Excel file.
-        writer.save()
-        buffer.seek(0)
-        return buffer
-
-    buffer = format_and_save_excel(checked_data, so_format_data)
+    results = result_store.get(request.args.get('session'))
+    if results is None or results.get('so_format_data') is None:
+        abort(404)
+    if results.get('report') is not None and os.path.isfile(results['report']):
+        buffer = results['report']
+    else:
+        # report still rendering in the background
+        buffer = format_and_save_excel(results['checked_data'], results['so_format_data'], io.BytesIO())
+    sheet_name = results['sheet_name']
     vm = VMPropsManager()
 
     return send_file(
@@ -1163,6 +1767,80 @@ def download_report():
     )
 
 
+# Upload a large order form
+@app.server.route('/uploads/', methods=['GET', 'POST'])
+def upload_order_form():
+    """
+    Upload a large order form to the server, as a file of the session
+
+    The file is streamed from the request to disk in chunks (werkzeug spools it to a temporary
+    file while parsing the form), instead of going through the browser as a base64 string
+
+    Parameters
+    ----------
+    None
+
+    Returns
+    -------
+    page : str
+        Upload page, with the uploaded filename
+    """
+    session_id = request.args.get('session')
+    if session_id is None or not session_id.isalnum():
+        abort(400)
+    message = ''
+    if request.method == 'POST':
+        upload = request.files.get('file')
+        if upload is None or not upload.filename.lower().endswith(('.xlsx', '.xlsm')):
+            message = 'Error: Please select an Excel file'
+        else:
+            check_create_directory(uploads_path)
+            remove_old_files(uploads_path + '*', result_store.ttl_seconds)
+            upload_path = os.path.abspath(uploads_path + uuid.uuid4().hex + os.path.splitext(upload.filename)[1])
+            upload.save(upload_path)
+            result_store.update(session_id, {'upload': {'path': upload_path, 'filename': upload.filename}})
+            message = 'Uploaded: %s' % escape(upload.filename)
+            print('[Status]', datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"), ' Uploaded: ', upload_path)
+    return large_upload_page % message
+
+
+# Export the SO or checked table
+@app.server.route('/downloads/export/')
+def export_tables():
+    """
+    Export the SO or checked table as CSV, streamed, Parquet or Feather
+
+    Parameters
+    ----------
+    None
+
+    Returns
+    -------
+    response : flask.Response
+        File response
+    """
+    results = result_store.get(request.args.get('session'))
+    file_format = request.args.get('format')
+    table = {'so': 'so_format_data', 'checks': 'checked_data'}.get(request.args.get('table'))
+    if results is None or table is None or results.get(table) is None or file_format not in get_export_formats():
+        abort(404)
+    extension, mimetype = EXPORT_FORMATS[file_format]
+    filename = '%s %s%s' % (results['sheet_name'], 'SO Table' if table == 'so_format_data' else 'Checks', extension)
+    if file_format == 'csv':
+        return Response(
+            iter_csv_chunks(results[table]),
+            mimetype=mimetype,
+            headers={'Content-Disposition': 'attachment; filename="%s"' % filename, 'Cache-Control': 'no-cache'}
+        )
+    return send_file(
+        export_table(results[table], io.BytesIO(), file_format),
+        mimetype=mimetype,
+        attachment_filename=filename,
+        as_attachment=True,
+        cache_timeout=0
+    )
+
+
 # Run the Dash app server
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='VM Props Formatter App')
@@ -0,0 +1,36 @@
+import argparse
+import datetime
+import time
+from vm_props_formatter.batch_converter import find_order_forms, run_batch
+from vm_props_formatter.utils.table_exporter import EXPORT_FORMATS
+from vm_props_formatter.utils.file_organizer import check_create_directory
+from vm_props_formatter.utils.logger import format_logs
+
+outputs_path = 'outputs/'
+settings_path = 'settings/'
+
+# Run the batch conversion
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='VM Props Formatter batch conversion')
+    parser.add_argument('inputs', nargs='+', help='Folders, glob patterns or filenames of the order forms')
+    parser.add_argument('--analysis-type', choices=['auto', 'Regular', 'Seasonal'], default='auto',
+                        help='Settings to use, auto takes Seasonal if the filename says so')
+    parser.add_argument('--output', default=outputs_path + 'reports/', help='Folder to write the reports into')
+    parser.add_argument('--workers', type=int, default=None, help='Number of processes, defaults to the CPUs')
+    parser.add_argument('--streaming', help='Load the files in streaming read-only mode', action='store_true')
+    parser.add_argument('--format', choices=['xlsx'] + list(EXPORT_FORMATS), default='xlsx',
+                        help='xlsx for formatted reports, or a format to export the SO and checked tables to')
+    arguments = parser.parse_args()
+    check_create_directory(outputs_path)
+    format_logs('VM Props Formatter Batch', True)
+
+    file_paths = find_order_forms(arguments.inputs)
+    print('[Status]', datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"), ' Converting %d file(s) ...' % len(
+        file_paths))
+    start_time = time.time()
+    run_summary = run_batch(file_paths, arguments.output, arguments.analysis_type, settings_path,
+                            arguments.streaming, arguments.workers, arguments.format)
+    print(run_summary[['file', 'entity', 'analysis_type', 'status', 'so_rows', 'failed_checks', 'seconds']]
+          .to_string(index=False))
+    print('[Status]', datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"), ' Batch complete in %.3fs!' % (
+        time.time() - start_time))